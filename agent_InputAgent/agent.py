@@ -1,49 +1,186 @@
 from summoner.client import SummonerClient
-from multi_ainput import multi_ainput
-from aioconsole import ainput, aprint
-from typing import Any
-import argparse, json
+from multi_ainput import multi_ainput, ainput_with_paste, set_bracketed_paste
+from load_script import LoadScript, format_report, load_scenarios
+from log_replay import describe, load_requests, replay_payloads, replay_schedule
+from payload_input import parse_content, read_file_payloads, iter_stdin_payloads
+from display import MessageDisplay
+from aioconsole import aprint
+from collections import deque
+from typing import Any, Optional
+import argparse, asyncio, atexit, json, signal, threading
 
 # ---- CLI: prompt mode toggle -----------------------------------------------
 prompt_parser = argparse.ArgumentParser()
 prompt_parser.add_argument("--multiline", required=False, type=int, choices=[0, 1], default=0, help="Use multi-line input mode with backslash continuation (1 = enabled, 0 = disabled). Default: 0.")
+# ---- CLI: scripted load-generator mode (non-interactive) --------------------
+prompt_parser.add_argument("--script", required=False, default=None, help="Send scenarios from a JSON/JSONL file or a directory instead of reading the keyboard.")
+prompt_parser.add_argument("--rate", required=False, type=float, default=None, help="Open-loop send rate in messages per second (script mode).")
+prompt_parser.add_argument("--concurrency", required=False, type=int, default=None, help="Max requests awaiting a reply (script mode). Default: 1 if --rate is not set.")
+prompt_parser.add_argument("--count", required=False, type=int, default=None, help="Total messages to send, cycling through the scenarios (script mode). Default: one pass.")
+prompt_parser.add_argument("--timeout", required=False, type=float, default=60.0, help="Seconds before a request without reply counts as a timeout (script mode). Default: 60.")
+prompt_parser.add_argument("--replies-per-request", required=False, type=int, default=1, help="Replies expected per request, e.g. the number of runners connected (script mode). Default: 1.")
+prompt_parser.add_argument("--report", required=False, default=None, help="Also write the final load report as JSON to this path (script mode).")
+prompt_parser.add_argument("--probe-timeout", required=False, type=float, default=None, help="Before the timed run, probe every second until a request gets all --replies-per-request replies, for at most this many seconds (script mode). Default: off.")
+# ---- CLI: replay of recorded server traffic (script mode) --------------------
+prompt_parser.add_argument("--replay", required=False, default=None, help="Replay the request timing found in server logs (a log file with its rotated backups, or a directory). Bodies come from --script.")
+prompt_parser.add_argument("--speed", required=False, default="original", help="Replay speed: 'original', 'max', or a speed-up factor such as 10. Default: original.")
+prompt_parser.add_argument("--since", required=False, type=float, default=None, help="Replay only requests at least this many seconds after the first logged one.")
+prompt_parser.add_argument("--until", required=False, type=float, default=None, help="Replay only requests at most this many seconds after the first logged one.")
+# ---- CLI: large payloads ----------------------------------------------------
+prompt_parser.add_argument("--stdin", required=False, action="store_true", help="Send JSON documents streamed on stdin (one, JSON Lines, or concatenated) instead of reading the keyboard.")
 prompt_args, _ = prompt_parser.parse_known_args()
 
 client = SummonerClient(name="InputAgent")
 
+# Scripted load generator (None in interactive mode).
+load: Optional[LoadScript] = None
+if prompt_args.replay:
+    if not prompt_args.script:
+        prompt_parser.error("--replay needs --script: the logs only keep 'from'/'to', message bodies come from the scenarios.")
+    replay_events = load_requests(prompt_args.replay, since=prompt_args.since, until=prompt_args.until)
+    if not replay_events:
+        prompt_parser.error(f"--replay: no logged requests in {prompt_args.replay}.")
+    try:
+        replay_offsets = replay_schedule(replay_events, prompt_args.speed)
+    except ValueError:
+        prompt_parser.error("--speed must be 'original', 'max', or a positive factor.")
+    print(describe(replay_events, replay_offsets))
+    load = LoadScript(
+        replay_payloads(replay_events, load_scenarios(prompt_args.script)),
+        count=prompt_args.count,
+        concurrency=prompt_args.concurrency,
+        timeout=prompt_args.timeout,
+        schedule=replay_offsets,
+        replies_per_request=prompt_args.replies_per_request,
+        probe_timeout=prompt_args.probe_timeout,
+    )
+elif prompt_args.script:
+    load = LoadScript(
+        load_scenarios(prompt_args.script),
+        count=prompt_args.count,
+        rate=prompt_args.rate,
+        concurrency=prompt_args.concurrency,
+        timeout=prompt_args.timeout,
+        replies_per_request=prompt_args.replies_per_request,
+        probe_timeout=prompt_args.probe_timeout,
+    )
+
+
+# Payloads waiting to be sent (e.g. the rest of an @file with several documents).
+queued_payloads: deque = deque()
+
+
+async def show(text: str) -> None:
+    await aprint(text)
+    await aprint("> ", end="")
+
+
+# Received messages are queued here and drawn in batches (see display.py).
+display = MessageDisplay(show)
+
+
+# --stdin: documents decoded by a reader thread, None marks end of input.
+stdin_payloads: Optional[asyncio.Queue] = None
+
+
+def start_stdin_reader() -> asyncio.Queue:
+    """Decode stdin in a thread; each complete document is handed to the event loop."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def pump() -> None:
+        try:
+            for payload in iter_stdin_payloads():
+                loop.call_soon_threadsafe(queue.put_nowait, payload)
+        except ValueError as e:
+            loop.call_soon_threadsafe(queue.put_nowait, f"[stdin] invalid JSON: {e}")
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    threading.Thread(target=pump, name="stdin-json", daemon=True).start()
+    return queue
+
+
+async def finish_load() -> None:
+    """
+    Print (and optionally save) the load report once every request is answered
+    or timed out, then stop the client as Ctrl+C would, so scripted runs end.
+    """
+    assert load is not None
+    await load.done.wait()
+    report = load.report()
+    await aprint(format_report(report))
+    if prompt_args.report:
+        with open(prompt_args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    signal.raise_signal(signal.SIGINT)
+
 @client.receive(route="")
 async def receiver_handler(msg: Any) -> None:
     # Extract content from dict payloads, or use the raw message as-is.
     content = (msg["content"] if isinstance(msg, dict) and "content" in msg else msg)
     addr    = (msg.get("remote_addr") if isinstance(msg, dict) else "unknown")
 
+    # Script mode: replies are matched and measured, not printed one by one.
+    if load is not None and load.on_reply(content):
+        return
+
     # Choose a display tag. This is visual only; it does not affect routing.
     tag = ("\r[From server]" if isinstance(content, str) and content[:len("Warning:")] == "Warning:" else "\r[Received]")
 
-    max_len = 200
-    if isinstance(content, dict):
-        details = "\n".join(
-            f"  \033[93m{k}\033[0m: \033[90m{str(v)[:max_len]}{'...' if len(str(v)) > max_len else ''}\033[0m"
-            for k, v in content.items()
-        )
-    else:
-        content_str = str(content)
-        details = "\033[90m" + content_str[:max_len] + ("..." if len(content_str) > max_len else "") + "\033[0m"
-
-    await aprint(f"\033[95m{tag}\033[0m Sent by \033[96m{addr}\033[0m:\n{details}")
-    await aprint("> ", end="")
+    # Rendering and console I/O happen in the display task, batched per screen update.
+    display.post(tag, addr, content)
 
 @client.send(route="")
 async def send_handler() -> str:
+    if load is not None:
+        if not load.started:
+            load.start()
+            asyncio.get_running_loop().create_task(finish_load())
+        payload = await load.next_payload()
+        if payload is None:
+            # Everything was sent; wait for the remaining replies without spinning.
+            await asyncio.sleep(1.0)
+        return payload
+
+    global stdin_payloads
+    if queued_payloads:
+        return queued_payloads.popleft()
+
+    if prompt_args.stdin:
+        if stdin_payloads is None:
+            stdin_payloads = start_stdin_reader()
+        payload = await stdin_payloads.get()
+        if payload is None:
+            # End of input: stay connected (to receive replies) without spinning.
+            stdin_payloads.put_nowait(None)
+            await asyncio.sleep(1.0)
+        elif isinstance(payload, str):
+            await aprint(f"\033[31m{payload}\033[0m")
+            return None
+        return payload
+
     if bool(int(prompt_args.multiline)):
         # Multi-line compose with continuation and echo cleanup.
         content: str = await multi_ainput("> ", "~ ", "\\")
     else:
-        # Single-line compose.
-        content: str = await ainput("> ")
+        # Single-line compose (a bracketed paste may span several lines).
+        content: str = await ainput_with_paste("> ")
 
     strip = content.strip()
 
+    # @path: send the JSON document(s) in a file, parsed off the event loop.
+    if strip.startswith("@") and len(strip) > 1:
+        try:
+            payloads = await asyncio.to_thread(read_file_payloads, strip[1:])
+        except (OSError, ValueError) as e:
+            await aprint(f"\033[31mCould not load {strip[1:]}: {e}\033[0m")
+            return None
+        if not payloads:
+            return None
+        queued_payloads.extend(payloads[1:])
+        return payloads[0]
+
     if strip == "/test":
         return {
         "rendered": (
@@ -113,17 +250,19 @@ async def send_handler() -> str:
         "from": "b1f9a2d3f7e84b12a6d9c0e1aa44c8f0"
         }
 
-    # Parse as JSON if possible; otherwise, return the raw string
-    output = None
-    try:
-        output = json.loads(content.replace("\n", ""))
-    except:
-        output = content
-    return output
+    # Parse as JSON if possible (newlines inside strings are kept); otherwise, return the raw string
+    return parse_content(content)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run a Summoner client with a specified config.")
     parser.add_argument('--config', dest='config_path', required=False, help='The relative path to the config file (JSON) for the client (e.g., --config configs/client_config.json)')
+    parser.add_argument('--host', dest='host', required=False, default="127.0.0.1", help='Server host. Default: 127.0.0.1.')
+    parser.add_argument('--port', dest='port', required=False, type=int, default=8888, help='Server port. Default: 8888.')
     args, _ = parser.parse_known_args()
 
-    client.run(host="127.0.0.1", port=8888, config_path=args.config_path or "configs/client_config.json")
+    if not (prompt_args.script or prompt_args.stdin):
+        # Let the terminal mark pastes so large payloads skip per-line handling.
+        set_bracketed_paste(True)
+        atexit.register(set_bracketed_paste, False)
+
+    client.run(host=args.host, port=args.port, config_path=args.config_path or "configs/client_config.json")
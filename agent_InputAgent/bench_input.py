@@ -0,0 +1,132 @@
+"""
+Benchmark: cost of turning a large pasted JSON scenario into a payload.
+
+    python agent_InputAgent/bench_input.py --sizes 10 100 1000
+
+Compares, per payload size (KB):
+  legacy  - multi-line mode: every line ends with the '\\' sentinel, is measured
+            with the per-character wcwidth walk and redrawn, then the text goes
+            through json.loads(content.replace("\\n", ""))
+  paste   - bracketed paste: lines are joined verbatim, parsed once
+  stream  - @file / --stdin: 64 KB chunks fed to the incremental decoder
+
+Console reads (ainput) are not included: only the per-line work that differs.
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Any, Callable
+
+from wcwidth import wcwidth
+
+from multi_ainput import _CLEAR_LINE, _CURSOR_DOWN_FMT, _CURSOR_UP_FMT, _rows_used
+from payload_input import iter_json_documents, parse_content
+
+# Synthetic scenarios come from the template's memory benchmark (same payload shape).
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent_templates", "template_1_1"))
+from bench_memory import make_scenario  # noqa: E402
+
+
+def _legacy_rows_used(prompt: str, text: str, tabsize: int = 8) -> int:
+    """The per-character walk multi_ainput used for every line (no fast path)."""
+    cols = max(1, shutil.get_terminal_size((80, 20)).columns)
+    rows, col = 1, 0
+    for ch in prompt + text:
+        if ch == "\t":
+            new_col = col + (tabsize - col % tabsize)
+        else:
+            w = wcwidth(ch)
+            new_col = col + (w if w is not None and w >= 0 else 0)
+        if new_col >= cols:
+            rows += new_col // cols
+            col = new_col % cols
+        else:
+            col = new_col
+    return rows
+
+
+def make_payload(kb: int) -> dict:
+    """A scenario-shaped payload of about `kb` kilobytes (shared generator)."""
+    payload = make_scenario(kb, 0)
+    # A string with real line breaks: the legacy path silently drops them.
+    payload["raw"]["scenario"] = "Line one of the scenario.\nLine two of the scenario."
+    payload["from"] = "bench"
+    return payload
+
+
+def legacy_path(lines: list[str]) -> Any:
+    out = io.StringIO()
+    prompt = "> "
+    for line in lines[:-1]:
+        rows = _legacy_rows_used(prompt, line + "\\")
+        out.write(_CURSOR_UP_FMT.format(rows))
+        for r in range(rows):
+            out.write("\r" + _CLEAR_LINE)
+            if r < rows - 1:
+                out.write(_CURSOR_DOWN_FMT.format(1))
+        if rows > 1:
+            out.write(_CURSOR_UP_FMT.format(rows - 1))
+        out.write(f"{prompt}{line}\n")
+        prompt = "~ "
+    content = "\n".join(lines)
+    try:
+        return json.loads(content.replace("\n", ""))
+    except ValueError:
+        return content
+
+
+def legacy_path_fast_rows(lines: list[str]) -> Any:
+    """Legacy multi-line flow with only the _rows_used fast path applied."""
+    prompt = "> "
+    for line in lines[:-1]:
+        _rows_used(prompt, line + "\\")
+        prompt = "~ "
+    return parse_content("\n".join(lines))
+
+
+def paste_path(lines: list[str]) -> Any:
+    return parse_content("\n".join(lines))
+
+
+def stream_path(text: str) -> Any:
+    chunks = (text[i:i + 65536] for i in range(0, len(text), 65536))
+    return next(iter_json_documents(chunks))
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark large-payload input paths of the InputAgent.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000], help="Payload sizes in KB.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'lines':>7} {'legacy ms':>10} {'fast rows ms':>13} {'paste ms':>9} {'stream ms':>10}  newlines kept (legacy/new)")
+    for kb in args.sizes:
+        payload = make_payload(kb)
+        text = json.dumps(payload, indent=2, ensure_ascii=False).replace("\\n", "\n")
+        lines = text.split("\n")
+
+        t_legacy, r_legacy = best_of(lambda: legacy_path(lines), args.repeat)
+        t_rows, _ = best_of(lambda: legacy_path_fast_rows(lines), args.repeat)
+        t_paste, r_paste = best_of(lambda: paste_path(lines), args.repeat)
+        t_stream, r_stream = best_of(lambda: stream_path(text), args.repeat)
+
+        expected = payload["raw"]["scenario"]
+        kept_legacy = isinstance(r_legacy, dict) and r_legacy["raw"]["scenario"] == expected
+        kept_new = r_paste == payload and r_stream == payload
+        print(
+            f"{kb:>6}KB {len(lines):>7} {t_legacy:>10.1f} {t_rows:>13.1f} {t_paste:>9.1f} {t_stream:>10.1f}"
+            f"  {'yes' if kept_legacy else 'NO'}/{'yes' if kept_new else 'NO'}"
+        )
@@ -0,0 +1,160 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+
+def _repr_str_prefix(s: str, k: int) -> str:
+    """
+    First characters of repr(s) without building repr of the whole string:
+    pick the quote repr(s) would pick, then repr only s[:k] (plus one char that
+    forces the same quote) and drop that char and the closing quote.
+    """
+    use_double = "'" in s and '"' not in s
+    return repr(s[:k] + ("'" if use_double else '"'))[:-2]
+
+
+def _iter_repr(obj: Any, budget: int) -> Iterator[str]:
+    """Yield pieces of repr(obj), stopping once about `budget` chars were produced."""
+    if isinstance(obj, str):
+        if len(obj) <= budget:
+            yield repr(obj)
+        else:
+            yield _repr_str_prefix(obj, budget)
+        return
+    if isinstance(obj, dict):
+        open_, close = "{", "}"
+        items: Any = obj.items()
+    elif isinstance(obj, list):
+        open_, close = "[", "]"
+        items = obj
+    elif isinstance(obj, tuple):
+        open_, close = "(", ",)" if len(obj) == 1 else ")"
+        items = obj
+    else:
+        yield repr(obj)
+        return
+
+    yield open_
+    used = 1
+    for i, item in enumerate(items):
+        if used >= budget:
+            return
+        if i:
+            yield ", "
+            used += 2
+        if isinstance(obj, dict):
+            k, v = item
+            for piece in _iter_repr(k, budget - used):
+                used += len(piece)
+                yield piece
+            yield ": "
+            used += 2
+            item = v
+        for piece in _iter_repr(item, budget - used):
+            used += len(piece)
+            yield piece
+            if used >= budget:
+                return
+    yield close
+
+
+def preview(obj: Any, limit: int = 200) -> str:
+    """
+    Same text as str(obj)[:limit] (+ '...' when cut), but only the needed
+    prefix of nested structures is ever rendered.
+    """
+    if isinstance(obj, str):
+        text = obj[:limit + 1]
+    elif isinstance(obj, (dict, list, tuple)):
+        parts: list[str] = []
+        used = 0
+        for piece in _iter_repr(obj, limit + 1):
+            parts.append(piece)
+            used += len(piece)
+            if used > limit:
+                break
+        text = "".join(parts)
+    else:
+        text = str(obj)
+    if len(text) > limit:
+        return text[:limit] + "..."
+    return text
+
+
+class MessageDisplay:
+    """
+    Coalesces received messages into batched screen updates.
+
+    `post()` only queues the raw message (no formatting, no console I/O), so
+    the receive handler returns immediately. A background task renders what
+    arrived since the last update every `interval` seconds with a single
+    print. Bursts larger than `max_per_flush` show the most recent messages
+    plus a count of the skipped ones.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[str], Awaitable[Any]],
+        interval: float = 0.05,
+        max_per_flush: int = 20,
+        max_keys: int = 20,
+        max_len: int = 200,
+        backlog: int = 1000,
+    ) -> None:
+        self.write = write
+        self.interval = interval
+        self.max_per_flush = max_per_flush
+        self.max_keys = max_keys
+        self.max_len = max_len
+        self.pending: deque = deque(maxlen=backlog)
+        self.received = 0
+        self.skipped = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def post(self, tag: str, addr: Any, content: Any) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self.pending) == self.pending.maxlen:
+            self.skipped += 1  # the oldest entry is about to be dropped
+        self.pending.append((tag, addr, content))
+        self.received += 1
+        assert self._wakeup is not None
+        self._wakeup.set()
+
+    def format_one(self, tag: str, addr: Any, content: Any) -> str:
+        if isinstance(content, dict):
+            lines = []
+            for i, (k, v) in enumerate(content.items()):
+                if i == self.max_keys:
+                    lines.append(f"  \033[90m... {len(content) - i} more key(s)\033[0m")
+                    break
+                lines.append(f"  \033[93m{k}\033[0m: \033[90m{preview(v, self.max_len)}\033[0m")
+            details = "\n".join(lines)
+        else:
+            details = "\033[90m" + preview(content, self.max_len) + "\033[0m"
+        return f"\033[95m{tag}\033[0m Sent by \033[96m{addr}\033[0m:\n{details}"
+
+    def render_batch(self) -> Optional[str]:
+        batch = list(self.pending)
+        self.pending.clear()
+        if not batch:
+            return None
+        skipped = self.skipped + max(0, len(batch) - self.max_per_flush)
+        self.skipped = 0
+        blocks = [self.format_one(*m) for m in batch[-self.max_per_flush:]]
+        if skipped:
+            blocks.insert(0, f"\033[90m... {skipped} earlier message(s) not shown\033[0m")
+        return "\n".join(blocks)
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            text = self.render_batch()
+            if text is not None:
+                await self.write(text)
+            # Let more messages pile up before the next update.
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,361 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Any, Optional
+
+# percentile() is shared with the template runner's tools (token budget, trace summary).
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent_templates", "template_1_1"))
+from stats import percentile  # noqa: E402
+
+
+def load_scenarios(path: str) -> list[Any]:
+    """
+    Read scenarios from a .json file (one payload, or a list of payloads),
+    a .jsonl file (one payload per line), or a directory of those.
+    """
+    if os.path.isdir(path):
+        out: list[Any] = []
+        for entry in sorted(os.listdir(path)):
+            if entry.endswith((".json", ".jsonl")):
+                out.extend(load_scenarios(os.path.join(path, entry)))
+        return out
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+        return data if isinstance(data, list) else [data]
+
+
+def expected_qids(payload: Any) -> list[str]:
+    """QIDs a reply should answer: raw.points keys, else raw.questions keys."""
+    raw = payload.get("raw") if isinstance(payload, dict) else None
+    if not isinstance(raw, dict):
+        return []
+    for key in ("points", "questions"):
+        if isinstance(raw.get(key), dict):
+            return list(raw[key])
+    return []
+
+
+class LoadScript:
+    """
+    Non-interactive load generator for the InputAgent.
+
+    Every outgoing payload gets a unique "from" id; the runner replies with
+    "to" set to that id, which is how replies are matched to requests.
+
+    Pacing is either open-loop (`rate` messages per second, regardless of
+    replies) or closed-loop (at most `concurrency` requests awaiting a reply).
+
+    With several runners connected, each request gets one reply per runner:
+    `replies_per_request` is that fan-out. A request stays pending until all
+    of its replies arrived; latency is measured to the first and to the last.
+
+    With `probe_timeout`, the run starts with a probe: the first scenario is
+    sent every `probe_interval` seconds (outside the measurements) until one
+    copy gets all of its replies, i.e. the runners are connected and warmed up.
+    The clock starts after that, or after `probe_timeout` seconds regardless
+    (the report then says the probe failed).
+    """
+
+    def __init__(
+        self,
+        scenarios: list[Any],
+        count: Optional[int] = None,
+        rate: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        timeout: float = 60.0,
+        schedule: Optional[list[float]] = None,
+        replies_per_request: int = 1,
+        probe_timeout: Optional[float] = None,
+        probe_interval: float = 1.0,
+    ) -> None:
+        if not scenarios:
+            raise ValueError("No scenarios to send.")
+        self.scenarios = scenarios
+        self.count = count if count is not None else len(scenarios)
+        self.rate = rate
+        self.timeout = timeout
+        # Optional explicit send offsets (seconds from start), one per message.
+        self.schedule = schedule
+        if schedule is not None:
+            self.count = min(self.count, len(schedule))
+        if concurrency is None and not rate and schedule is None:
+            concurrency = 1  # nothing else paces the sends
+        self.concurrency = concurrency
+        self.replies_per_request = max(1, replies_per_request)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.probe_timeout = probe_timeout
+        self.probe_interval = probe_interval
+
+        self.sent = 0
+        self._next_index = 0
+        self.pending: dict[str, tuple[float, list[str]]] = {}
+        self.latencies: list[float] = []          # to the first reply
+        self.last_latencies: list[float] = []     # to the last expected reply
+        self.reply_counts: dict[str, int] = {}    # every reply, per request id
+        self.timeouts = 0
+        self.partial_fanout = 0                   # some but not all replies before the timeout
+        self.unmatched_replies = 0
+        self.server_warnings = 0
+        self.missing_qids = 0
+        self.expected_qids_total = 0
+        self.replies_with_missing = 0
+        self.cancelled_replies = 0
+
+        self.done = asyncio.Event()
+        self.ready = asyncio.Event()              # probe answered (set at once without a probe)
+        self.probes_sent = 0
+        self.probe_s: Optional[float] = None
+        self._probe_replies: dict[str, int] = {}
+        self._launched: Optional[float] = None
+        if self.count <= 0:
+            self.count = 0
+            self.done.set()  # nothing to send (e.g. --count 0, or a replay window with no requests)
+        self._slots = asyncio.Semaphore(self.concurrency) if self.concurrency else None
+        self._t0: Optional[float] = None
+        self._t_end: Optional[float] = None
+        self._reaper: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._launched is not None
+
+    def start(self) -> None:
+        """Start the run: the probe when configured, else the clock right away."""
+        if self._launched is None:
+            self._launched = time.monotonic()
+            if not self.probe_timeout:
+                self.ready.set()
+                self._start_clock()
+
+    def _start_clock(self) -> None:
+        """Start the clock (t=0 of the schedule) and the timeout reaper."""
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_timeouts())
+
+    async def _next_probe(self) -> Optional[Any]:
+        """The next probe payload, or None once the probe is over (answered or timed out)."""
+        assert self._launched is not None and self.probe_timeout
+        if self.probes_sent:
+            try:
+                await asyncio.wait_for(self.ready.wait(), self.probe_interval)
+            except asyncio.TimeoutError:
+                pass
+        if not self.ready.is_set() and time.monotonic() - self._launched < self.probe_timeout:
+            base = self.scenarios[0]
+            payload = dict(base) if isinstance(base, dict) else {"message": base}
+            payload["from"] = f"probe-{self.run_id}-{self.probes_sent:03d}"
+            self._probe_replies[payload["from"]] = 0
+            self.probes_sent += 1
+            return payload
+        self.ready.set()
+        return None
+
+    async def next_payload(self) -> Optional[Any]:
+        """Wait until the next message is due, then return it (None when all were sent)."""
+        self.start()
+        if self._t0 is None:
+            probe = await self._next_probe()
+            if probe is not None:
+                return probe
+            self._start_clock()
+        assert self._t0 is not None
+        # Reserve the index first so concurrent callers never send the same slot twice.
+        idx = self._next_index
+        if idx >= self.count:
+            return None
+        self._next_index += 1
+
+        if self.schedule is not None:
+            due = self._t0 + self.schedule[idx]
+        elif self.rate:
+            due = self._t0 + idx / self.rate
+        else:
+            due = None
+        if due is not None:
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if self._slots is not None:
+            await self._slots.acquire()
+
+        base = self.scenarios[idx % len(self.scenarios)]
+        qid = f"load-{self.run_id}-{idx:06d}"
+        payload = dict(base) if isinstance(base, dict) else {"message": base}
+        payload["from"] = qid
+        self.pending[qid] = (time.monotonic(), expected_qids(payload))
+        self.reply_counts[qid] = 0
+        self.sent += 1
+        return payload
+
+    def _finish(self, qid: str) -> Optional[tuple[float, list[str]]]:
+        entry = self.pending.pop(qid, None)
+        if entry is not None and self._slots is not None:
+            self._slots.release()
+        if self.sent >= self.count and not self.pending:
+            self._t_end = time.monotonic()
+            self.done.set()
+        return entry
+
+    def on_reply(self, content: Any) -> bool:
+        """Match a received message to its request. Returns False if it is not ours."""
+        if isinstance(content, str) and content.startswith("Warning:"):
+            self.server_warnings += 1
+            return False
+        if not isinstance(content, dict):
+            return False
+        to = content.get("to")
+        if isinstance(to, str) and to in self._probe_replies:
+            self._probe_replies[to] += 1
+            if self._probe_replies[to] >= self.replies_per_request and not self.ready.is_set():
+                assert self._launched is not None
+                self.probe_s = time.monotonic() - self._launched
+                self.ready.set()
+            return True
+        if not isinstance(to, str) or not to.startswith(f"load-{self.run_id}-"):
+            return False
+
+        if to not in self.reply_counts:
+            self.unmatched_replies += 1
+            return True
+        self.reply_counts[to] += 1
+        n = self.reply_counts[to]
+        entry = self.pending.get(to)
+        if entry is None:
+            # Late reply after a timeout, or more replies than expected.
+            self.unmatched_replies += 1
+            return True
+        sent_at, qids = entry
+        elapsed = time.monotonic() - sent_at
+        if n >= self.replies_per_request:
+            self.last_latencies.append(elapsed)
+            self._finish(to)
+        if n > 1:
+            return True  # answers are checked on the first reply
+        self.latencies.append(elapsed)
+
+        answers = content.get("answers")
+        answered = set(answers) if isinstance(answers, dict) else set()
+        missing = [q for q in qids if q not in answered]
+        self.expected_qids_total += len(qids)
+        self.missing_qids += len(missing)
+        if missing:
+            self.replies_with_missing += 1
+        if "cancelled" in content:
+            self.cancelled_replies += 1
+        return True
+
+    async def _reap_timeouts(self) -> None:
+        while not self.done.is_set():
+            await asyncio.sleep(min(1.0, self.timeout / 4))
+            now = time.monotonic()
+            for qid, (sent_at, qids) in list(self.pending.items()):
+                if now - sent_at > self.timeout:
+                    if self.reply_counts.get(qid):
+                        self.partial_fanout += 1
+                    else:
+                        self.timeouts += 1
+                        self.expected_qids_total += len(qids)
+                        self.missing_qids += len(qids)
+                    self._finish(qid)
+
+    def mode(self) -> str:
+        if self.schedule is not None:
+            mode = "scheduled"
+        elif self.rate:
+            mode = f"open-loop {self.rate}/s"
+        else:
+            mode = "closed-loop"
+        if self.concurrency:
+            mode += f", concurrency {self.concurrency}"
+        return mode
+
+    def report(self) -> dict[str, Any]:
+        lat = sorted(self.latencies)
+        last = sorted(self.last_latencies)
+        counts = sorted(self.reply_counts.values())
+        end = self._t_end or time.monotonic()
+        elapsed = end - self._t0 if self._t0 is not None else 0.0
+        ms = lambda v: None if v is None else round(v * 1000, 1)
+        return {
+            "sent": self.sent,
+            "replies": len(lat),
+            "timeouts": self.timeouts,
+            "unmatched_replies": self.unmatched_replies,
+            "server_warnings": self.server_warnings,
+            "cancelled_replies": self.cancelled_replies,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_msgs_s": round(len(lat) / elapsed, 3) if elapsed > 0 else None,
+            "latency_ms": {
+                "p50": ms(percentile(lat, 50)),
+                "p90": ms(percentile(lat, 90)),
+                "p99": ms(percentile(lat, 99)),
+                "max": ms(lat[-1] if lat else None),
+            },
+            "latency_last_reply_ms": {
+                "p50": ms(percentile(last, 50)),
+                "p90": ms(percentile(last, 90)),
+                "p99": ms(percentile(last, 99)),
+                "max": ms(last[-1] if last else None),
+            },
+            "fanout": {
+                "expected_replies_per_request": self.replies_per_request,
+                "replies_total": sum(counts),
+                "per_request_min": counts[0] if counts else None,
+                "per_request_p50": percentile(counts, 50),
+                "per_request_max": counts[-1] if counts else None,
+                "partial": self.partial_fanout,
+            },
+            "qids": {
+                "expected": self.expected_qids_total,
+                "missing": self.missing_qids,
+                "replies_with_missing": self.replies_with_missing,
+            },
+            "mode": self.mode(),
+            "probe": None if not self.probe_timeout else {
+                "ready": self.probe_s is not None,
+                "seconds": None if self.probe_s is None else round(self.probe_s, 3),
+                "sent": self.probes_sent,
+            },
+        }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lat = report["latency_ms"]
+    q = report["qids"]
+    return (
+        f"\033[95m[load]\033[0m {report['mode']}: sent {report['sent']}, replies {report['replies']}, "
+        f"timeouts {report['timeouts']}, server warnings {report['server_warnings']}\n"
+        f"\033[95m[load]\033[0m latency p50 {lat['p50']} ms, p90 {lat['p90']} ms, p99 {lat['p99']} ms, max {lat['max']} ms; "
+        f"throughput {report['throughput_msgs_s']} msg/s over {report['elapsed_s']} s\n"
+        f"\033[95m[load]\033[0m QIDs missing {q['missing']}/{q['expected']} "
+        f"({q['replies_with_missing']} reply(ies) incomplete, {report['cancelled_replies']} cancelled)"
+        + _format_fanout(report)
+        + _format_probe(report)
+    )
+
+
+def _format_probe(report: dict[str, Any]) -> str:
+    p = report.get("probe")
+    if not p:
+        return ""
+    if p["ready"]:
+        return f"\n\033[95m[load]\033[0m probe answered after {p['seconds']} s ({p['sent']} sent)"
+    return f"\n\033[31m[load] probe not answered ({p['sent']} sent): runners were not all ready\033[0m"
+
+
+def _format_fanout(report: dict[str, Any]) -> str:
+    f = report["fanout"]
+    if f["expected_replies_per_request"] <= 1 and (f["per_request_max"] or 0) <= 1:
+        return ""
+    last = report["latency_last_reply_ms"]
+    return (
+        f"\n\033[95m[load]\033[0m replies per request min {f['per_request_min']}, p50 {f['per_request_p50']}, "
+        f"max {f['per_request_max']} (expected {f['expected_replies_per_request']}, {f['partial']} partial); "
+        f"last reply p50 {last['p50']} ms, p99 {last['p99']} ms"
+    )
@@ -0,0 +1,167 @@
+import glob
+import json
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+
+# Text log lines: "<asctime> - <name> - <level> - <message>"
+_TEXT_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?) - [^-]+ - \w+ - (.*)$")
+_ROTATED = re.compile(r"\.(\d+)$")
+
+
+@dataclass(frozen=True)
+class LogEvent:
+    t: float                 # seconds since the epoch
+    sender: Optional[str]    # "from" of the logged message
+    to: Optional[str]        # "to" of the logged message (set on replies)
+
+
+def log_files(path: str) -> list[str]:
+    """
+    Files to read, oldest first. `path` is a log file (its rotated backups
+    `<file>.1`, `<file>.2`, ... are included), or a directory of such files.
+    """
+    if os.path.isdir(path):
+        bases = sorted(
+            p for p in glob.glob(os.path.join(path, "*"))
+            if os.path.isfile(p) and not _ROTATED.search(p)
+        )
+        return [f for base in bases for f in log_files(base)]
+    backups = [p for p in glob.glob(glob.escape(path) + ".*") if _ROTATED.search(p)]
+    # RotatingFileHandler: the highest suffix is the oldest.
+    backups.sort(key=lambda p: int(_ROTATED.search(p).group(1)), reverse=True)  # type: ignore[union-attr]
+    return backups + ([path] if os.path.isfile(path) else [])
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().replace(",", ".").replace("T", " ")
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(text[:26], fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def _as_dict(value: Any) -> Optional[dict]:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value[:1] == "{":
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+    return None
+
+
+def _find_routing(message: Any, depth: int = 0) -> Optional[dict]:
+    """The dict holding "from"/"to": the message itself or its (nested) "content"."""
+    d = _as_dict(message)
+    if d is None or depth > 3:
+        return None
+    if "from" in d or "to" in d:
+        return d
+    return _find_routing(d.get("content"), depth + 1)
+
+
+def parse_line(line: str) -> Optional[LogEvent]:
+    """A LogEvent for a logged message carrying "from"/"to", else None."""
+    line = line.strip()
+    if not line:
+        return None
+    record = _as_dict(line)
+    if record is not None:
+        t = parse_timestamp(record.get("timestamp", record.get("asctime", record.get("time"))))
+        message: Any = record.get("message", record)
+    else:
+        m = _TEXT_LINE.match(line)
+        if m is None:
+            return None
+        t = parse_timestamp(m.group(1))
+        message = m.group(2)
+    routing = _find_routing(message)
+    if t is None or routing is None:
+        return None
+    sender, to = routing.get("from"), routing.get("to")
+    return LogEvent(t, None if sender is None else str(sender), None if to is None else str(to))
+
+
+def iter_events(path: str) -> Iterator[LogEvent]:
+    for file in log_files(path):
+        with open(file, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                event = parse_line(line)
+                if event is not None:
+                    yield event
+
+
+def load_requests(path: str, since: Optional[float] = None, until: Optional[float] = None) -> list[LogEvent]:
+    """
+    Requests (messages without "to") in time order. Replies are left out:
+    the agents under test produce their own.
+    `since`/`until` are offsets in seconds from the first request.
+    """
+    events = sorted((e for e in iter_events(path) if e.to is None), key=lambda e: e.t)
+    if not events:
+        return []
+    t0 = events[0].t
+    return [
+        e for e in events
+        if (since is None or e.t - t0 >= since) and (until is None or e.t - t0 <= until)
+    ]
+
+
+def replay_schedule(events: list[LogEvent], speed: str = "original") -> list[float]:
+    """
+    Send offsets (seconds from start) for LoadScript.
+    speed: "original", "max" (everything due at once), or a factor such as "10"
+    (ten times faster than recorded).
+    """
+    if not events:
+        return []
+    if speed == "max":
+        return [0.0] * len(events)
+    factor = 1.0 if speed == "original" else float(speed)
+    if factor <= 0:
+        raise ValueError("--speed must be 'original', 'max', or a positive factor.")
+    t0 = events[0].t
+    return [(e.t - t0) / factor for e in events]
+
+
+def replay_payloads(events: list[LogEvent], scenarios: list[Any]) -> list[Any]:
+    """
+    One payload per request. The logs only keep "from"/"to", so bodies come from
+    `scenarios`; a given original sender is always mapped to the same scenario.
+    """
+    if not scenarios:
+        raise ValueError("Replay needs scenarios (--script) to fill the message bodies.")
+    return [
+        scenarios[zlib.crc32((e.sender or "").encode("utf-8")) % len(scenarios)]
+        for e in events
+    ]
+
+
+def describe(events: list[LogEvent], schedule: list[float]) -> str:
+    if not events:
+        return "\033[95m[replay]\033[0m no requests found in the logs"
+    recorded = events[-1].t - events[0].t
+    senders = len({e.sender for e in events})
+    peak = 0
+    j = 0
+    for i, e in enumerate(events):
+        while e.t - events[j].t >= 1.0:
+            j += 1
+        peak = max(peak, i - j + 1)
+    return (
+        f"\033[95m[replay]\033[0m {len(events)} request(s) from {senders} sender(s) over {recorded:.1f} s "
+        f"(peak {peak} msg/s), replayed over {schedule[-1]:.1f} s"
+    )
@@ -7,6 +7,18 @@ _CURSOR_UP_FMT = "\x1b[{}A"
 _CURSOR_DOWN_FMT = "\x1b[{}B"
 _CLEAR_LINE = "\x1b[2K"
 
+# Bracketed paste: once enabled, the terminal wraps pasted text in these markers.
+_PASTE_ON = "\x1b[?2004h"
+_PASTE_OFF = "\x1b[?2004l"
+PASTE_START = "\x1b[200~"
+PASTE_END = "\x1b[201~"
+
+def set_bracketed_paste(enabled: bool) -> None:
+    """Ask the terminal to mark pasted text (no-op when stdout is not a TTY)."""
+    if sys.stdout.isatty():
+        sys.stdout.write(_PASTE_ON if enabled else _PASTE_OFF)
+        sys.stdout.flush()
+
 def _rows_used(prompt: str, text: str, tabsize: int = 8) -> int:
     """
     Accurately compute how many terminal rows the echoed line occupied,
@@ -14,6 +26,11 @@ def _rows_used(prompt: str, text: str, tabsize: int = 8) -> int:
     """
     cols = max(1, shutil.get_terminal_size((80, 20)).columns)
 
+    # Fast path: printable ASCII is one cell per char, so no per-char walk.
+    line = prompt + text
+    if line.isascii() and line.isprintable():
+        return 1 + len(line) // cols
+
     def _advance(col: int, ch: str) -> int:
         if ch == "\t":
             # advance to next tab stop
@@ -64,6 +81,13 @@ async def multi_ainput(
     while True:
         line: str = await ainput(current_prompt)
 
+        if PASTE_START in line:
+            # Bracketed paste: take the pasted block verbatim (real newlines,
+            # no continuation sentinel, no per-line redraw).
+            typed, _, pasted = line.partition(PASTE_START)
+            lines.append(typed + await read_pasted(PASTE_START + pasted))
+            break
+
         if line.endswith(sentinel):
             line_clean = line[:-1]
             lines.append(line_clean)
@@ -94,3 +118,24 @@ async def multi_ainput(
 
     return "\n".join(lines)
 
+
+async def read_pasted(first_line: str) -> str:
+    """
+    Collect one bracketed paste that started on `first_line`.
+    Lines are read without prompt or redraw until the end marker.
+    """
+    chunk = first_line[len(PASTE_START):]
+    parts: list[str] = []
+    while PASTE_END not in chunk:
+        parts.append(chunk)
+        chunk = await ainput("")
+    parts.append(chunk[:chunk.index(PASTE_END)])
+    return "\n".join(parts)
+
+async def ainput_with_paste(prompt: str = "> ") -> str:
+    """Single-line input that also accepts one multi-line bracketed paste."""
+    line: str = await ainput(prompt)
+    if PASTE_START in line:
+        typed, _, pasted = line.partition(PASTE_START)
+        return typed + await read_pasted(PASTE_START + pasted)
+    return line
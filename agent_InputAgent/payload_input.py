@@ -0,0 +1,156 @@
+import codecs
+import json
+import re
+import sys
+from typing import Any, Iterable, Iterator, Optional
+
+_decoder = json.JSONDecoder(strict=False)
+_WHITESPACE = " \t\r\n"
+
+
+def parse_content(content: str) -> Any:
+    """
+    Parse typed or pasted text as JSON if possible; otherwise return it as-is.
+    strict=False accepts raw newlines inside string values, so a multi-line
+    string keeps its line breaks instead of having them stripped.
+    """
+    try:
+        return _decoder.decode(content)
+    except ValueError:
+        return content
+
+
+# Structural scan of a JSON stream: what matters outside strings, and the rest
+# of a string up to its closing quote (escapes included).
+_NON_WS = re.compile(r"\S")
+_INSIDE = re.compile(r'[{}\[\]"]')
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_BARE = re.compile(r'[^\s{}\[\]",:]+')
+
+
+def _decode_at(buf: str, start: int, end: int) -> Any:
+    """Decode the document spanning buf[start:end]; anything else is a parse error."""
+    obj, stop = _decoder.raw_decode(buf, start)
+    if stop != end:
+        raise json.JSONDecodeError("Unexpected data after a JSON document", buf, stop)
+    return obj
+
+
+def iter_json_documents(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Incrementally decode a stream of text chunks into JSON documents
+    (one document, JSON Lines, or documents simply concatenated).
+
+    Bracket depth and string state are tracked across chunks, so a document is
+    decoded once, as soon as its closing bracket arrives, and yielded right
+    away. A malformed document raises ValueError when it ends, not at EOF.
+    """
+    buf = ""
+    pos = 0                 # next character to scan
+    start: Optional[int] = None   # where the current document starts
+    depth = 0
+    in_string = False
+
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            if in_string:
+                m = _STRING_REST.match(buf, pos)
+                if m is None:
+                    # Rest of the buffer is inside the string; an odd trailing
+                    # backslash escapes a character that has not arrived yet.
+                    backslashes = len(buf) - pos - len(buf[pos:].rstrip("\\"))
+                    pos = len(buf) - backslashes % 2
+                    break
+                pos = m.end()
+                in_string = False
+                if depth == 0:
+                    assert start is not None
+                    yield _decode_at(buf, start, pos)   # top-level string
+                    start = None
+            elif depth == 0:
+                m = _NON_WS.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                start, c = m.start(), m.group()
+                if c in "{[":
+                    depth, pos = 1, m.end()
+                elif c == '"':
+                    in_string, pos = True, m.end()
+                elif c in "}]":
+                    _decode_at(buf, start, m.end())     # raises: stray closing bracket
+                else:
+                    bare = _BARE.match(buf, start)
+                    end = bare.end() if bare else start + 1
+                    if end == len(buf):
+                        pos, start = start, None        # a number/literal may continue
+                        break
+                    yield _decode_at(buf, start, end)
+                    pos, start = end, None
+            else:
+                m = _INSIDE.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                c, pos = m.group(), m.end()
+                if c == '"':
+                    in_string = True
+                elif c in "{[":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        assert start is not None
+                        yield _decode_at(buf, start, pos)
+                        start = None
+        # Keep only the unfinished document (or the unscanned tail).
+        keep = start if start is not None else pos
+        buf = buf[keep:]
+        pos -= keep
+        if start is not None:
+            start = 0
+
+    # End of stream: whatever is left must decode, or it is an error.
+    pos = 0
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            return
+        obj, pos = _decoder.raw_decode(buf, pos)
+        yield obj
+
+
+def iter_text_chunks(stream: Any, size: int = 1 << 20) -> Iterator[str]:
+    """Read a text stream in large chunks (blocking)."""
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_file_payloads(path: str) -> list[Any]:
+    """All JSON documents in a file (blocking; run it in a thread)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return list(iter_json_documents(iter_text_chunks(f)))
+
+
+def iter_stdin_payloads() -> Iterator[Any]:
+    """JSON documents from stdin, yielded as each one completes (blocking)."""
+    # read1 returns what is available instead of waiting for a full buffer,
+    # so interactive pipes are not held back.
+    reader = sys.stdin.buffer
+    def chunks() -> Iterator[str]:
+        # Incremental: a multi-byte character split across two reads is decoded whole.
+        utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = reader.read1(1 << 20)
+            if not data:
+                tail = utf8.decode(b"", final=True)
+                if tail:
+                    yield tail
+                return
+            yield utf8.decode(data)
+    return iter_json_documents(chunks())
@@ -1,23 +1,63 @@
+# Startup timeline (local file, same folder). Imported first so it sees everything.
+from startup_profile import STARTUP
+
 import warnings
 warnings.filterwarnings("ignore", message=r".*supports OpenSSL.*LibreSSL.*")
 
 import asyncio
 import argparse
+import itertools
 import json
 import os
-from typing import Any, Optional, Union
-from aioconsole import aprint
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Iterable, Optional, Union
+
+with STARTUP.phase("import dotenv + load .env"):
+    # Kept eager: the module-level knobs below read values from .env.
+    from dotenv import load_dotenv
+    load_dotenv()
+
+with STARTUP.phase("import summoner"):
+    # Needed at import time: handlers are registered with decorators below.
+    from summoner.client import SummonerClient
+    from summoner.protocol import Direction, Event, Stay, Action
+
+with STARTUP.phase("import local modules"):
+    # Hackathon safeguard (local file, same folder); tiktoken itself is loaded on first use.
+    from safeguards import count_chat_tokens, get_encoding, get_usage_from_response, TOKEN_COUNT_CACHE
+
+    # Steps JSON loading / validation / hot reload (local file, same folder)
+    from steps_plan import (
+        StepsPlan, StepOutputs, PlanReloader, compile_steps_plan, load_steps_plan,
+        build_messages, build_shared_prefix, normalize_response_format, sanitize_model, step_name,
+    )
+
+    # Optional warm restart: durable spool + mmap snapshot (local file, same folder)
+    from warm_start import MessageSpool, WarmSnapshot, commit_snapshot, load_snapshot, save_snapshot
+
+    # OpenAI HTTP connection pool settings + metrics (local file, same folder)
+    from http_pool import (
+        OpenAIPoolConfig, PoolMetrics, build_http_client, keep_pool_warm, load_pool_config, report_pool_metrics,
+    )
+
+    # Client-side pacing of replies against the server's rate limits (local file, same folder)
+    from pacing import PacerConfig, ReplyPacer, load_pacer_config
 
-from openai import AsyncOpenAI
-from openai.types.chat.chat_completion import ChatCompletion
-from dotenv import load_dotenv
-load_dotenv()
+    # Opt-in per-message profiling (local file, same folder)
+    from profiling import NULL_PROFILE, MessageProfiler
 
-from summoner.client import SummonerClient
-from summoner.protocol import Direction, Event, Stay, Action
+    # Opt-in tracing: one trace per payload, exported to local JSONL (local file, same folder)
+    from tracing import NULL_TRACE, JsonlSpanExporter, Tracer
 
-# Hackathon safeguard (local file, same folder)
-from safeguards import count_chat_tokens
+    # Opt-in per-step max_tokens learned from past completions (local file, same folder)
+    from token_budget import TokenBudget, save_budget, step_key
+
+# Heavy third-party modules (openai, aioconsole) are imported lazily, on first
+# use or by warm_up(); these imports are only for type checkers.
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from openai.types.chat.chat_completion import ChatCompletion
 
 # -----------------------------------------------------------------------------
 # Minimal config
@@ -25,6 +65,11 @@ from safeguards import count_chat_tokens
 AGENT_ID = "minimal_agent"
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+# --ignore-replies: drop payloads that are replies (carry "to", or come from a
+# runner). With several runners on one server they would otherwise answer
+# each other's broadcast replies without end (used by bench_servers.py).
+IGNORE_REPLIES = False
+
 # Hackathon knob: hard cap on how many OpenAI calls we do per incoming payload.
 MAX_OPENAI_CALLS = int(os.getenv("MAX_OPENAI_CALLS", "5"))  # set to 5 for this example
 
@@ -37,87 +82,325 @@ MAX_INPUT_TOKENS = 2000
 MAX_OUTPUT_TOKENS = 600
 
 # Prompts come from a JSON file (see dummy format below).
-PROMPT_STEPS: list[dict] = []
-DEFAULT_SYSTEM_PROMPT = "You are an assistant helping other agents with their requests."
-
-# Which step outputs are packaged into out["answers"].
+# The whole file is compiled into one immutable StepsPlan (steps, system prompt
+# and output_agents). Each message grabs the current plan once, so a hot reload
+# swaps it atomically between messages and in-flight pipelines finish on the old one.
+# output_agents: which step outputs are packaged into out["answers"].
 # If empty, we default to [last step].
-OUTPUT_AGENTS: list[str] = []
+PLAN: StepsPlan = compile_steps_plan({})
+plan_reloader: Optional[PlanReloader] = None
 
 # One queue: receive handler buffers payloads, send handler consumes them.
+# Items are (spool_id, received_at, trace, payload); spool_id is None when no --spool
+# is configured, received_at (time.monotonic()) orders replies waiting in the pacer,
+# trace is the payload's Trace (NULL_TRACE when --trace is off).
 message_buffer: Optional[asyncio.Queue] = None
 buffer_lock: Optional[asyncio.Lock] = None
 
-# OpenAI client (direct, no wrappers)
-openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
-
-def sanitize_model(maybe_model: Any) -> str:
+# Warm restart (opt-in): payloads are logged to the spool until handled, and the
+# plan + token-count cache are snapshotted so a restart does not start cold.
+message_spool: Optional[MessageSpool] = None
+warm_snapshot: Optional[WarmSnapshot] = None
+SNAPSHOT_PATH: Optional[str] = None
+SNAPSHOT_INTERVAL_SECS = 60.0
+
+# OpenAI client (direct, no wrappers). Built on first use or by warm_up().
+# Its HTTP pool (limits, keep-alive, HTTP/2) comes from the "openai_client"
+# section of the client config; see http_pool.OpenAIPoolConfig.
+openai_client: Optional["AsyncOpenAI"] = None
+_client_lock = threading.Lock()
+# --fast-start: set when the background warm-up has finished (or failed). The send
+# path awaits it instead of blocking the event loop on _client_lock or the imports.
+warm_done: Optional[asyncio.Event] = None
+POOL_CONFIG = OpenAIPoolConfig()
+pool_metrics = PoolMetrics(POOL_CONFIG.max_connections)
+
+# Documented startup budget: module import + setup() until the agent is ready to
+# connect, with --fast-start. Reported by --profile-startup.
+FAST_START_TARGET_MS = 300.0
+
+# Reply pacing (token bucket), from the "pacing" section of the client config.
+# None when the section is absent or null: replies are sent as soon as they are ready.
+pacer: Optional[ReplyPacer] = None
+
+# --profile: phase timings + stack samples of selected messages. When None, the
+# send path only talks to NULL_PROFILE, whose calls are no-ops.
+profiler: Optional[MessageProfiler] = None
+
+# --trace: spans from the receive hook to the send hook, correlated by a
+# "trace_id" field (on the received envelope, and on the reply).
+tracer: Optional[Tracer] = None
+
+# --token-budget: max_tokens per step sized from its completion history (capped
+# at MAX_OUTPUT_TOKENS) instead of always MAX_OUTPUT_TOKENS. Saved periodically.
+token_budget: Optional[TokenBudget] = None
+BUDGET_SAVE_INTERVAL_SECS = 60.0
+
+
+def get_openai_client() -> "AsyncOpenAI":
+    """Return the shared AsyncOpenAI client, importing openai and building it once."""
+    global openai_client
+    if openai_client is None:
+        with _client_lock:
+            if openai_client is None:
+                with STARTUP.phase("import openai + build client"):
+                    from openai import AsyncOpenAI
+                    openai_client = AsyncOpenAI(
+                        api_key=os.environ.get("OPENAI_API_KEY"),
+                        base_url=POOL_CONFIG.base_url,  # None -> OPENAI_BASE_URL or the public API
+                        http_client=build_http_client(POOL_CONFIG, pool_metrics),
+                    )
+    return openai_client
+
+
+async def aprint(*args: Any, **kwargs: Any) -> None:
+    """aioconsole.aprint, imported on first use."""
+    from aioconsole import aprint as _aprint
+    await _aprint(*args, **kwargs)
+
+
+def warm_up() -> None:
     """
-    Hackathon restriction:
-      - Only 'gpt-4o-mini' or 'gpt-4o' allowed.
-      - Any other value becomes 'gpt-4o-mini'.
+    Pay the heavy one-time costs up front (blocking; run it in a thread):
+    the OpenAI client and the tokenizer for the default model.
     """
-    if maybe_model in ("gpt-4o-mini", "gpt-4o"):
-        return maybe_model
-    return "gpt-4o-mini"
+    get_openai_client()
+    with STARTUP.phase("load tokenizer"):
+        get_encoding(MODEL)
+    with STARTUP.phase("import aioconsole"):
+        import aioconsole  # noqa: F401
 
 
-def normalize_response_format(value: Any) -> str:
+def warm_ready() -> bool:
+    return openai_client is not None and (warm_done is None or warm_done.is_set())
+
+
+async def wait_for_warm_up() -> None:
     """
-    Hackathon-friendly:
-      - Users choose 'json' or 'text'.
-      - Anything else defaults to 'json'.
+    Make sure the client and tokenizer are ready without blocking the event loop:
+    wait for a background warm-up still running, and redo a failed one in a thread.
     """
-    if value == "text":
-        return "text"
-    return "json"
+    if warm_done is not None and not warm_done.is_set():
+        await warm_done.wait()
+    if openai_client is None:
+        await asyncio.to_thread(warm_up)
+
+
+async def ping_openai() -> Any:
+    """Cheapest request on the pooled client (GET /models), for keep-alive."""
+    await wait_for_warm_up()
+    return await get_openai_client().models.list()
+
+
+def install_plan(plan: StepsPlan) -> None:
+    """Swap the active plan. Messages already being processed keep their own reference."""
+    global PLAN
+    PLAN = plan
 
 
-def select_incoming_by_path(incoming: Any, path: str) -> Any:
+def plan_from_snapshot(snapshot: Optional[WarmSnapshot], steps_path: str) -> Optional[StepsPlan]:
+    """Reuse the snapshotted plan only if the steps file has not changed since."""
+    if snapshot is None or not isinstance(snapshot.plan, dict):
+        return None
+    try:
+        mtime_ns = os.stat(steps_path).st_mtime_ns
+    except OSError:
+        return None
+    if snapshot.plan.get("source") != steps_path or snapshot.plan.get("mtime_ns") != mtime_ns:
+        return None
+    try:
+        return compile_steps_plan(snapshot.plan.get("config"), source=steps_path, mtime_ns=mtime_ns)
+    except ValueError:
+        return None
+
+
+def snapshot_state() -> tuple[dict, Iterable[tuple[int, int]]]:
+    """Capture plan + token counts on the event loop; the result is safe to write from a thread."""
+    plan_state = {
+        "source": PLAN.source,
+        "mtime_ns": PLAN.mtime_ns,
+        "config": {
+            "system_prompt": PLAN.system_prompt,
+            "prompt_layout": PLAN.prompt_layout,
+            "output_agents": list(PLAN.output_agents),
+            "steps": list(PLAN.steps),
+        },
+    }
+    old = warm_snapshot.items() if warm_snapshot is not None else ()
+    # Fresh in-memory counts go last so they win over the loaded snapshot.
+    return plan_state, itertools.chain(old, list(TOKEN_COUNT_CACHE.items()))
+
+
+def swap_snapshot() -> None:
     """
-    Minimal dotted-path selector for hackathon configs.
-    Examples:
-      "raw" -> incoming["raw"]
-      "raw.questions" -> incoming["raw"]["questions"]
-    Missing path returns None.
+    Move the snapshot written with commit=False into place and map it instead of
+    the old one, which is unmapped first (Windows will not replace a mapped file).
+    Runs on the event loop thread, so no token count lookup sees it half-swapped.
     """
-    cur = incoming
-    for part in path.split("."):
-        if isinstance(cur, dict) and part in cur:
-            cur = cur[part]
-        else:
-            return None
-    return cur
+    global warm_snapshot
+    if warm_snapshot is not None:
+        warm_snapshot.close()
+    try:
+        commit_snapshot(SNAPSHOT_PATH)
+    finally:
+        # The new file, or the old one again if the replace failed.
+        warm_snapshot = load_snapshot(SNAPSHOT_PATH)
+        TOKEN_COUNT_CACHE.fallback = warm_snapshot.lookup if warm_snapshot is not None else None
+
+
+def write_snapshot() -> None:
+    """Persist the current plan and token-count cache (no-op without --snapshot)."""
+    if SNAPSHOT_PATH:
+        save_snapshot(SNAPSHOT_PATH, *snapshot_state(), commit=False)
+        swap_snapshot()
+
+
+async def snapshot_periodically() -> None:
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECS)
+        try:
+            await asyncio.to_thread(save_snapshot, SNAPSHOT_PATH, *snapshot_state(), commit=False)
+            swap_snapshot()
+        except Exception as e:
+            await aprint(f"\033[31m[warm start] snapshot failed: {type(e).__name__}: {e}\033[0m")
 
 
-def render_block(obj: Any) -> str:
-    """Render injected blocks in a prompt-friendly way."""
-    if obj is None:
-        return ""
-    if isinstance(obj, (dict, list)):
-        return json.dumps(obj, ensure_ascii=False, indent=2)
-    return str(obj)
+def write_token_budget() -> None:
+    """Persist the learned completion-token history (no-op without --token-budget)."""
+    if token_budget is not None and token_budget.path and token_budget.dirty:
+        save_budget(token_budget.path, token_budget.state())
 
 
-async def setup(steps_path: str) -> None:
-    global message_buffer, buffer_lock, PROMPT_STEPS, DEFAULT_SYSTEM_PROMPT, OUTPUT_AGENTS
+async def save_token_budget_periodically() -> None:
+    assert token_budget is not None and token_budget.path
+    while True:
+        await asyncio.sleep(BUDGET_SAVE_INTERVAL_SECS)
+        if not token_budget.dirty:
+            continue
+        try:
+            await asyncio.to_thread(save_budget, token_budget.path, token_budget.state())
+        except Exception as e:
+            await aprint(f"\033[31m[token budget] save failed: {type(e).__name__}: {e}\033[0m")
+
+
+async def warm_up_in_background(profile_startup: bool = False) -> None:
+    try:
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        # Not fatal: the first message retries the same imports (in a thread).
+        await aprint(f"\033[31m[startup] background warm-up failed: {type(e).__name__}: {e}\033[0m")
+        return
+    finally:
+        if warm_done is not None:
+            warm_done.set()
+    ms = STARTUP.mark("warm")
+    if profile_startup:
+        await aprint(f"[startup] background warm-up done at {ms:.1f} ms")
+
+
+async def setup(
+    steps_path: str,
+    watch: bool = False,
+    reload_interval: float = 1.0,
+    spool_path: Optional[str] = None,
+    snapshot_path: Optional[str] = None,
+    fast_start: bool = False,
+    profile_startup: bool = False,
+    pool_config: Optional[OpenAIPoolConfig] = None,
+    pacer_config: Optional[PacerConfig] = None,
+    message_profiler: Optional[MessageProfiler] = None,
+    span_exporter: Optional[JsonlSpanExporter] = None,
+    budget_path: Optional[str] = None,
+) -> None:
+    global message_buffer, buffer_lock, plan_reloader, message_spool, warm_snapshot, SNAPSHOT_PATH
+    global POOL_CONFIG, pool_metrics, pacer, profiler, tracer, token_budget, warm_done
+    t0 = time.perf_counter()
     message_buffer = asyncio.Queue()
     buffer_lock = asyncio.Lock()
 
+    if snapshot_path:
+        with STARTUP.phase("setup: load snapshot"):
+            SNAPSHOT_PATH = snapshot_path
+            warm_snapshot = load_snapshot(snapshot_path)
+            if warm_snapshot is not None:
+                TOKEN_COUNT_CACHE.fallback = warm_snapshot.lookup
+
     # Hackathon participants: edit ONLY the JSON file, not the code.
     # JSON cannot contain comments, so we keep guidance here in Python.
-    with open(steps_path, "r", encoding="utf-8") as f:
-        cfg = json.load(f)
-
-    PROMPT_STEPS = cfg.get("steps", []) or []
-    DEFAULT_SYSTEM_PROMPT = cfg.get("system_prompt", DEFAULT_SYSTEM_PROMPT)
-    OUTPUT_AGENTS = cfg.get("output_agents", []) or []
-
-    if not isinstance(PROMPT_STEPS, list):
-        raise ValueError("'steps' must be a list in the steps JSON config.")
-    if not isinstance(OUTPUT_AGENTS, list):
-        raise ValueError("'output_agents' must be a list in the steps JSON config.")
+    with STARTUP.phase("setup: load steps plan"):
+        snapshot_plan = plan_from_snapshot(warm_snapshot, steps_path)
+        install_plan(snapshot_plan or load_steps_plan(steps_path))
+
+    if span_exporter is not None:
+        # Spans are written in batches by the exporter's thread, never on the loop.
+        tracer = Tracer(span_exporter)
+        span_exporter.start()
+
+    if budget_path:
+        token_budget = TokenBudget(budget_path, cap=MAX_OUTPUT_TOKENS)
+        asyncio.get_running_loop().create_task(save_token_budget_periodically())
+
+    recovered = 0
+    if spool_path:
+        # Replay everything that was received but never handled before the last exit.
+        with STARTUP.phase("setup: replay spool"):
+            message_spool = MessageSpool(spool_path)
+            for spool_id, payload in message_spool.recover():
+                trace = tracer.begin(recovered=True) if tracer is not None else NULL_TRACE
+                message_buffer.put_nowait((spool_id, time.monotonic(), trace, payload))
+                recovered += 1
+
+    if pool_config is not None:
+        POOL_CONFIG = pool_config
+        pool_metrics = PoolMetrics(pool_config.max_connections)
+
+    if pacer_config is not None:
+        pacer = ReplyPacer(pacer_config)
+
+    if message_profiler is not None:
+        # Samples the thread running this loop, i.e. the one agent.run() uses.
+        profiler = message_profiler
+        profiler.start()
+
+    # Heavy imports + OpenAI client + tokenizer. By default we wait for them so the
+    # first message is fast; --fast-start defers them to a background thread.
+    if fast_start:
+        warm_done = asyncio.Event()
+        asyncio.get_running_loop().create_task(warm_up_in_background(profile_startup))
+    else:
+        await asyncio.to_thread(warm_up)
+
+    if watch:
+        # Edits to the steps file (or SIGHUP) are picked up without a restart.
+        # A broken file is reported and ignored; the agent keeps the last good plan.
+        plan_reloader = PlanReloader(steps_path, PLAN, install_plan, aprint, interval=reload_interval)
+        plan_reloader.start()
+
+    if spool_path or snapshot_path:
+        if snapshot_path:
+            asyncio.get_running_loop().create_task(snapshot_periodically())
+        await aprint(
+            f"\033[32m[warm start] setup in {(time.perf_counter() - t0) * 1000:.1f} ms: "
+            f"recovered {recovered} queued message(s), "
+            f"{len(warm_snapshot) if warm_snapshot is not None else 0} cached token count(s), "
+            f"plan from {'snapshot' if snapshot_plan is not None else 'file'}\033[0m"
+        )
+
+    loop = asyncio.get_running_loop()
+    if POOL_CONFIG.keepalive_ping_seconds:
+        # Keep a pooled connection alive across idle periods (GET /models when idle).
+        loop.create_task(keep_pool_warm(
+            ping_openai,
+            pool_metrics,
+            float(POOL_CONFIG.keepalive_ping_seconds),
+            aprint,
+        ))
+    if POOL_CONFIG.metrics_interval_seconds:
+        loop.create_task(report_pool_metrics(pool_metrics, float(POOL_CONFIG.metrics_interval_seconds), aprint))
+
+    STARTUP.mark("ready")
+    if profile_startup:
+        await aprint(STARTUP.report(target_ms=FAST_START_TARGET_MS if fast_start else None))
 
 
 # -----------------------------------------------------------------------------
@@ -144,9 +427,30 @@ async def validate_incoming(msg: Any) -> Optional[dict]:
     """
     Expect:
       msg = {"remote_addr": "...", "content": {...}}
+
+    Server "Warning: ..." messages (throttling, flow control, quarantine) are
+    also seen here: they slow down the reply pacer and are not answered.
     """
+    hook_start = time.time()
+    text = msg.get("content") if isinstance(msg, dict) else msg
+    if pacer is not None and isinstance(text, str) and text.startswith("Warning:"):
+        kind = pacer.on_warning(text)
+        await aprint(f"\033[33m[pacing] server {kind} warning: {json.dumps(pacer.snapshot())}\033[0m")
+        return None
     if not (isinstance(msg, dict) and "remote_addr" in msg and "content" in msg):
         return None
+    if IGNORE_REPLIES and isinstance(msg["content"], dict) and (
+        "to" in msg["content"] or msg["content"].get("from") == AGENT_ID
+    ):
+        return None
+    if tracer is not None and isinstance(msg["content"], dict):
+        # A sender may propagate its own trace id in the payload.
+        upstream = msg["content"].get("trace_id")
+        trace = tracer.begin(upstream if isinstance(upstream, str) else None, remote_addr=msg["remote_addr"])
+        span = trace.start("validate_incoming")
+        span.start = trace.root.start = hook_start
+        trace.end(span)
+        msg["trace_id"] = trace.trace_id
     return msg
 
 
@@ -159,7 +463,12 @@ async def add_sender_id(payload: Any) -> Optional[dict]:
         payload = {"message": payload}
     if not isinstance(payload, dict):
         return None
-    payload["from"] = AGENT_ID
+    trace = tracer.get(payload.get("trace_id")) if tracer is not None else NULL_TRACE
+    with trace.span("add_sender_id"):
+        payload["from"] = AGENT_ID
+    # The reply left send_message and reached the sender: the trace is complete.
+    trace.end_open("handoff")
+    trace.finish()
     return payload
 
 
@@ -172,7 +481,12 @@ async def recv_message(msg: Any) -> Event:
     content = msg["content"]
 
     # Buffer raw payload; the send handler will decide what to do with it.
-    await message_buffer.put(content)
+    # With a spool, the payload is on disk before it is queued.
+    trace = tracer.get(msg.get("trace_id")) if tracer is not None else NULL_TRACE
+    with trace.span("recv_message"):
+        spool_id = message_spool.append(content) if message_spool is not None else None
+    trace.start("queue")
+    await message_buffer.put((spool_id, time.monotonic(), trace, content))
     return Stay(Trigger.ok)
 
 
@@ -191,79 +505,66 @@ async def send_message() -> Optional[Union[dict, str]]:
     async with buffer_lock:
         if message_buffer.empty():
             return None
-        incoming = message_buffer.get_nowait()
+        spool_id, received_at, trace, incoming = message_buffer.get_nowait()
+
+    trace.end_open("queue", depth=message_buffer.qsize())
+    handed_off = False
+
+    # Snapshot the plan once: a hot reload during this pipeline must not mix plans.
+    plan = PLAN
+
+    prof = NULL_PROFILE
+    if profiler is not None:
+        prof = profiler.begin(str(incoming.get("from", "message")) if isinstance(incoming, dict) else "message")
+        prof.add("queue_wait", time.monotonic() - received_at)
 
     try:
-        if not PROMPT_STEPS:
+        if not plan.steps:
             raise RuntimeError("No steps loaded. Provide a valid --steps JSON config.")
 
-        incoming_json = json.dumps(incoming, ensure_ascii=False, indent=2)
-
-        # We keep ALL step outputs internally so later steps can depend on them.
-        all_step_outputs: dict[str, Any] = {}
+        # --fast-start: the first messages may arrive before the client and tokenizer exist.
+        if not warm_ready():
+            with prof.phase("warm_up"):
+                await wait_for_warm_up()
 
         # Hard cap: no more than MAX_OPENAI_CALLS calls.
-        steps_to_run = PROMPT_STEPS[:MAX_OPENAI_CALLS]
+        steps_to_run = list(plan.steps[:MAX_OPENAI_CALLS])
+
+        # Step outputs are kept only while a later step or the output packaging
+        # needs them: rendered dependency blocks until their last reader,
+        # output-agent payloads until they are merged into the answers.
+        outputs = StepOutputs(steps_to_run, plan.output_agents)
+
+        # Calls left under the cap, used to retry a reply cut by a learned max_tokens.
+        spare_calls = MAX_OPENAI_CALLS - len(steps_to_run)
 
         cancelled = False
         cancel_reason: Optional[dict[str, Any]] = None
 
+        # stable_prefix layout: scenario + questions are rendered once and open every step's prompt.
+        shared_prefix = build_shared_prefix(incoming) if plan.prompt_layout == "stable_prefix" else None
+
         for i, step in enumerate(steps_to_run):
-            name = step.get("name") or f"agent_{i+1}"
-
-            prompt_intro = step.get("prompt_intro", "") or ""
-            prompt_ending = step.get("prompt_ending", "") or ""
-            include_spec = step.get("include_incoming", True)
-
-            incoming_block = ""
-            if include_spec is True:
-                incoming_block = render_block(incoming)  # full payload (may be large)
-            elif include_spec is False:
-                incoming_block = ""
-            elif isinstance(include_spec, str):
-                incoming_block = render_block(select_incoming_by_path(incoming, include_spec))
-
-            # Dependency payload joining: only previous agents count.
-            deps = step.get("use_payload_from", []) or []
-            joined_deps: list[str] = []
-            if isinstance(deps, list):
-                for dep_name in deps:
-                    if dep_name in all_step_outputs:
-                        dep_payload = all_step_outputs[dep_name]
-                        if isinstance(dep_payload, (dict, list)):
-                            joined_deps.append(json.dumps(dep_payload, ensure_ascii=False, indent=2))
-                        else:
-                            joined_deps.append(str(dep_payload))
-
-            dep_block = "\n".join(joined_deps).strip()
-
-            # Prompt is built ONLY from JSON fields + injected blocks.
-            pieces: list[str] = []
-            if prompt_intro.strip():
-                pieces.append(prompt_intro.strip())
-            if incoming_block.strip():
-                pieces.append(incoming_block)
-            if dep_block:
-                pieces.append(dep_block)
-            if prompt_ending.strip():
-                pieces.append(prompt_ending.strip())
-            user_prompt = "\n\n".join(pieces).strip()
+            name = step_name(step, i)
+            step_span = trace.start("step", step=name, index=i)
+
+            # Prompt is built ONLY from JSON fields + injected blocks
+            # (incoming selection, then outputs of earlier steps it depends on).
+            with prof.phase("render", name):
+                messages = build_messages(plan, step, incoming, outputs.blocks, shared_prefix)
+            outputs.release(i)
+            user_prompt = messages[-1]["content"]
 
             # Per-step knobs (some optional, but restricted where requested)
-            system_prompt = step.get("system_prompt", DEFAULT_SYSTEM_PROMPT)
             model = sanitize_model(step.get("model", MODEL))
             temperature = step.get("temperature", None)
             fmt = normalize_response_format(step.get("response_format", "json"))
 
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
-
             # -------------------------------
             # Hackathon input token guardrail
             # -------------------------------
-            input_tokens = count_chat_tokens(messages, model=model)
+            with prof.phase("count_tokens", name):
+                input_tokens = count_chat_tokens(messages, model=model)
             if input_tokens > MAX_INPUT_TOKENS:
                 cancelled = True
                 cancel_reason = {
@@ -272,13 +573,20 @@ async def send_message() -> Optional[Union[dict, str]]:
                     "max_input_tokens": MAX_INPUT_TOKENS,
                     "actual_input_tokens": input_tokens,
                 }
-                all_step_outputs[name] = cancel_reason
+                outputs.record(i, cancel_reason)
+                trace.end(step_span, model=model, input_tokens=input_tokens, cancelled=True)
                 break
 
-            await aprint(f"\n\033[36m=== STEP {i+1}: {name} ===\033[0m")
-            await aprint(user_prompt)
+            with prof.phase("console", name):
+                await aprint(f"\n\033[36m=== STEP {i+1}: {name} ===\033[0m")
+                await aprint(user_prompt)
 
-            kwargs: dict[str, Any] = {"max_tokens": MAX_OUTPUT_TOKENS}  # hackathon output cap
+            budget_key = step_key(step, name, model) if token_budget is not None else None
+            # No call left to redo a reply cut by a learned limit: where a cut is fatal
+            # (unparseable JSON, or the answers themselves) use the wider, safe limit.
+            no_retry = spare_calls == 0 and (fmt == "json" or name in outputs.order)
+            max_tokens = token_budget.max_tokens(budget_key, safe=no_retry) if token_budget is not None and budget_key else MAX_OUTPUT_TOKENS
+            kwargs: dict[str, Any] = {"max_tokens": max_tokens}  # hackathon output cap (or learned, lower)
             if temperature is not None:
                 kwargs["temperature"] = float(temperature)
 
@@ -287,54 +595,80 @@ async def send_message() -> Optional[Union[dict, str]]:
             if fmt == "json":
                 kwargs["response_format"] = {"type": "json_object"}
 
-            resp: ChatCompletion = await openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                **kwargs,
-            )
+            with prof.phase("openai", name), trace.span("openai", step_span, step=name, model=model, input_tokens=input_tokens, max_tokens=max_tokens) as call:
+                resp: "ChatCompletion" = await get_openai_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **kwargs,
+                )
+                usage = get_usage_from_response(resp)
+                if token_budget is not None and budget_key:
+                    cut = token_budget.record(
+                        budget_key, usage.completion_tokens if usage else None, max_tokens, resp.choices[0].finish_reason,
+                    )
+                    if cut and spare_calls > 0:
+                        # Our learned limit truncated the reply: redo it once at the full cap.
+                        spare_calls -= 1
+                        await aprint(f"\033[33m[token budget] {name} hit max_tokens={max_tokens}; retrying with {MAX_OUTPUT_TOKENS}\033[0m")
+                        kwargs["max_tokens"] = MAX_OUTPUT_TOKENS
+                        resp = await get_openai_client().chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            **kwargs,
+                        )
+                        usage = get_usage_from_response(resp)
+                        token_budget.record(
+                            budget_key, usage.completion_tokens if usage else None, MAX_OUTPUT_TOKENS, resp.choices[0].finish_reason,
+                        )
+                        call.set(retried=True)
+                    elif cut:
+                        await aprint(f"\033[31m[token budget] {name} hit max_tokens={max_tokens}; no call left to retry\033[0m")
+                        call.set(cut=True)
+                if usage is not None:
+                    call.set(
+                        prompt_tokens=usage.prompt_tokens,
+                        completion_tokens=usage.completion_tokens,
+                        cached_tokens=usage.cached_tokens,
+                        finish_reason=resp.choices[0].finish_reason,
+                    )
+            del messages, user_prompt  # the rendered prompt is not needed past the call
+
+            if usage is not None:
+                with prof.phase("console", name):
+                    await aprint(
+                        f"\033[90m[usage] {name}: prompt {usage.prompt_tokens} (cached {usage.cached_tokens}), "
+                        f"completion {usage.completion_tokens}\033[0m"
+                    )
 
             text = (resp.choices[0].message.content or "").strip()
 
             parsed: Any = text
             if fmt == "json":
-                try:
-                    parsed = json.loads(text)
-                except Exception:
-                    parsed = {
-                        "error": "invalid_json_from_model",
-                        "raw_text": text,
-                    }
-
-            all_step_outputs[name] = parsed
-            await aprint(f"\033[34m{json.dumps({name: parsed}, indent=2, ensure_ascii=False)}\033[0m")
+                with prof.phase("parse", name):
+                    try:
+                        parsed = json.loads(text)
+                    except Exception:
+                        parsed = {
+                            "error": "invalid_json_from_model",
+                            "raw_text": text,
+                        }
+
+            outputs.record(i, parsed)
+            with prof.phase("console", name):
+                await aprint(f"\033[34m{json.dumps({name: parsed}, indent=2, ensure_ascii=False)}\033[0m")
+            trace.end(step_span, model=model, input_tokens=input_tokens)
 
         # -------------------------------
         # Packaging for hackathon output (MERGED)
         # -------------------------------
-        # We merge outputs of output_agents into ONE dict:
+        # Outputs of output_agents are merged into ONE dict as the steps finish
+        # (StepOutputs.record); this only merges what is left:
         # - If an output agent returns a dict, we merge keys into answers.
         # - Key conflicts resolved by output_agents priority: FIRST one wins.
         # - If an output agent returns non-dict, we store it under its agent name
         #   (also respecting "first wins" if that name key already exists).
-        if OUTPUT_AGENTS:
-            output_names = [n for n in OUTPUT_AGENTS if isinstance(n, str)]
-        else:
-            last_name = (steps_to_run[-1].get("name") if steps_to_run else None) or f"agent_{len(steps_to_run)}"
-            output_names = [last_name]
-
-        answers: dict[str, Any] = {}
-        for n in output_names:
-            if n not in all_step_outputs:
-                continue
-            payload = all_step_outputs[n]
-
-            if isinstance(payload, dict):
-                for k, v in payload.items():
-                    if k not in answers:   # first wins
-                        answers[k] = v
-            else:
-                if n not in answers:       # first wins
-                    answers[n] = payload
+        # - Without output_agents, the last step that can run is the output agent.
+        answers = outputs.finish()
 
         out: dict[str, Any] = {"answers": answers}
 
@@ -346,6 +680,17 @@ async def send_message() -> Optional[Union[dict, str]]:
         if isinstance(incoming, dict) and "from" in incoming:
             out["to"] = incoming["from"]
 
+        # Smooth reply bursts under the server's rate limit; oldest requests go first.
+        if pacer is not None:
+            with prof.phase("pace"), trace.span("pace"):
+                await pacer.acquire(received_at)
+
+        if trace is not NULL_TRACE:
+            # Carried by the reply so add_sender_id (and the receiver) can correlate it.
+            out["trace_id"] = trace.trace_id
+            trace.root.set(steps=outputs.recorded, cancelled=cancelled)
+            trace.start("handoff")
+            handed_off = True
         return out
 
     finally:
@@ -354,6 +699,13 @@ async def send_message() -> Optional[Union[dict, str]]:
             message_buffer.task_done()
         except Exception:
             pass
+        # Handled (answered or failed): do not replay it after a restart.
+        if message_spool is not None and spool_id is not None:
+            message_spool.ack(spool_id)
+        if profiler is not None and prof is not NULL_PROFILE:
+            profiler.end(prof)
+        if not handed_off:
+            trace.finish(error="no_reply")
 
 
 # -----------------------------------------------------------------------------
@@ -375,12 +727,137 @@ if __name__ == "__main__":
         default="configs/agent_steps.json",
         help="Path to prompt steps JSON (hackathon participants edit this).",
     )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Hot-reload the steps JSON when it changes on disk (or on SIGHUP) without restarting.",
+    )
+    parser.add_argument(
+        "--reload-interval",
+        dest="reload_interval",
+        type=float,
+        default=1.0,
+        help="Seconds between checks of the steps JSON when --watch is set (default: 1.0).",
+    )
+    parser.add_argument(
+        "--spool",
+        dest="spool_path",
+        default=None,
+        help="Append-only log of buffered payloads, replayed on restart (e.g. state/spool.jsonl).",
+    )
+    parser.add_argument(
+        "--snapshot",
+        dest="snapshot_path",
+        default=None,
+        help="Memory-mappable snapshot of plan and token-count cache, reloaded on restart (e.g. state/warm.snap).",
+    )
+    parser.add_argument(
+        "--fast-start",
+        action="store_true",
+        help="Do not wait for openai/tokenizer warm-up before connecting; warm up in the background.",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print a breakdown of import and setup cost, and time-to-ready.",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile_dir",
+        default=None,
+        help="Write phase timings and collapsed stacks of selected messages to this directory.",
+    )
+    parser.add_argument(
+        "--profile-every",
+        dest="profile_every",
+        type=int,
+        default=0,
+        help="With --profile: keep every Nth message (default: every message unless --profile-threshold-ms is set).",
+    )
+    parser.add_argument(
+        "--profile-threshold-ms",
+        dest="profile_threshold_ms",
+        type=float,
+        default=None,
+        help="With --profile: keep messages whose handling took at least this long.",
+    )
+    parser.add_argument(
+        "--profile-interval-ms",
+        dest="profile_interval_ms",
+        type=float,
+        default=5.0,
+        help="With --profile: stack sampling interval (default: 5 ms).",
+    )
+    parser.add_argument(
+        "--trace",
+        dest="trace_path",
+        default=None,
+        help="Export receive/step/send spans to this JSONL file (rotated); summarize with trace_summary.py.",
+    )
+    parser.add_argument(
+        "--token-budget",
+        dest="budget_path",
+        default=None,
+        help="Learn max_tokens per step from past completions, persisted in this JSON file (e.g. state/token_budget.json).",
+    )
+    parser.add_argument(
+        "--ignore-replies",
+        dest="ignore_replies",
+        action="store_true",
+        help="Drop incoming payloads that are replies ('to' set, or sent by a runner), e.g. when several runners share a server.",
+    )
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", default=8888, type=int)
     args = parser.parse_args()
+    IGNORE_REPLIES = args.ignore_replies
 
     if not os.environ.get("OPENAI_API_KEY"):
         raise RuntimeError("OPENAI_API_KEY is missing in the environment.")
 
-    agent.loop.run_until_complete(setup(args.steps_path))
-    agent.run(host=args.host, port=args.port, config_path=args.config_path)
+    if args.snapshot_path:
+        # Keep tiktoken's downloaded BPE files next to the snapshot instead of a temp dir.
+        os.environ.setdefault(
+            "TIKTOKEN_CACHE_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(args.snapshot_path)), "tiktoken"),
+        )
+
+    agent.loop.run_until_complete(
+        setup(
+            args.steps_path,
+            watch=args.watch,
+            reload_interval=args.reload_interval,
+            spool_path=args.spool_path,
+            snapshot_path=args.snapshot_path,
+            fast_start=args.fast_start,
+            profile_startup=args.profile_startup,
+            pool_config=load_pool_config(args.config_path),
+            pacer_config=load_pacer_config(args.config_path),
+            message_profiler=MessageProfiler(
+                args.profile_dir,
+                every_n=args.profile_every,
+                threshold_ms=args.profile_threshold_ms,
+                interval_ms=args.profile_interval_ms,
+            ) if args.profile_dir else None,
+            span_exporter=JsonlSpanExporter(args.trace_path) if args.trace_path else None,
+            budget_path=args.budget_path,
+        )
+    )
+    try:
+        agent.run(host=args.host, port=args.port, config_path=args.config_path)
+    finally:
+        try:
+            write_snapshot()
+        except Exception as e:
+            print(f"\033[31m[warm start] snapshot failed: {type(e).__name__}: {e}\033[0m")
+        try:
+            write_token_budget()
+        except Exception as e:
+            print(f"\033[31m[token budget] save failed: {type(e).__name__}: {e}\033[0m")
+        if message_spool is not None:
+            message_spool.close()
+        if profiler is not None:
+            profiler.stop()
+        if tracer is not None:
+            for trace in list(tracer.active.values()):
+                trace.finish(error="shutdown")
+            tracer.exporter.stop()
@@ -0,0 +1,197 @@
+"""
+Benchmark: peak memory of the step pipeline with many scenarios in flight.
+
+    python agent_templates/template_1_1/bench_memory.py --sizes 10 100 --concurrency 100
+
+Runs `--concurrency` scenarios at once through a steps plan, the way
+send_message does (render, model call, parse, package the answers), and
+measures the peak Python heap with tracemalloc. The model is the local stub's
+chat_completion (no HTTP) behind an asyncio sleep, so every pipeline is
+suspended mid-flight at the same time, like under load. Guardrails, console
+output and pacing are left out: they do not change what is kept in memory.
+
+Compares:
+  legacy   - every step output kept until the end, dependency blocks rendered
+             per reader, plus a pretty-printed copy of the incoming payload
+  bounded  - StepOutputs: each dependency block rendered once and dropped
+             after its last reader, output agents merged as they finish
+
+Both must produce the same answers; the benchmark checks it.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Optional
+
+from openai_stub import OpenAIStub
+from steps_plan import StepOutputs, StepsPlan, build_messages, compile_steps_plan, load_steps_plan, step_name
+
+
+# Five steps with a fan-in, so some outputs outlive their producer by several steps.
+BENCH_PLAN: dict[str, Any] = {
+    "system_prompt": "You are a helpful assistant. Be concise and correct.",
+    "output_agents": ["final_answer"],
+    "steps": [
+        {"name": "extract_task", "include_incoming": "raw.questions", "prompt_intro": "List the questions."},
+        {"name": "draft", "include_incoming": "raw.scenario", "use_payload_from": ["extract_task"], "prompt_intro": "Draft answers."},
+        {"name": "critique", "include_incoming": False, "use_payload_from": ["draft"], "prompt_intro": "Critique the draft."},
+        {"name": "final_answer", "include_incoming": False, "use_payload_from": ["draft", "critique"], "prompt_intro": "Final answers."},
+        {"name": "summary", "include_incoming": False, "use_payload_from": ["final_answer"], "prompt_intro": "Summarize."},
+    ],
+}
+
+
+def make_scenario(kb: int, index: int, pad: str = "questions") -> dict:
+    """
+    A scenario-shaped payload of about `kb` kilobytes (scenario, questions, points).
+    `pad` is the field that grows: "questions" adds questions, "scenario" keeps
+    five short questions and lengthens the scenario text instead.
+    Also used by bench_servers.py.
+    """
+    text = "Assume the supplier base is fragmented and risk is concentrated in peak season. "
+    questions: dict[str, str] = {}
+    points: dict[str, int] = {}
+    size = 0
+    i = 0
+    while size < kb * 1024 and (pad == "questions" or i < 5):
+        qid = f"Q{i:04d}"
+        questions[qid] = text * 2 if pad == "questions" else f"What should the team do first about item {i}, and why?"
+        points[qid] = 10 + i % 10
+        size += len(qid) + len(questions[qid]) + 16
+        i += 1
+    scenario = text * max(4, -(-(kb * 1024 - size) // len(text)))
+    return {"raw": {"scenario_id": f"bench-{kb}kb-{index}", "scenario": scenario, "questions": questions, "points": points}}
+
+
+class StubModel:
+    """chat.completions stand-in: the stub's answer after `latency_ms`."""
+
+    def __init__(self, latency_ms: float) -> None:
+        self.latency = latency_ms / 1000
+        self.stub = OpenAIStub(cache_entries=0)
+
+    async def __call__(self, messages: list[dict[str, str]]) -> str:
+        await asyncio.sleep(self.latency)
+        resp = self.stub.chat_completion({"messages": messages, "response_format": {"type": "json_object"}})
+        return resp["choices"][0]["message"]["content"]
+
+
+def parse(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except Exception:
+        return {"error": "invalid_json_from_model", "raw_text": text}
+
+
+async def legacy_pipeline(plan: StepsPlan, incoming: Any, model: StubModel) -> dict:
+    """send_message before StepOutputs."""
+    incoming_json = json.dumps(incoming, ensure_ascii=False, indent=2)  # noqa: F841  (kept alive, as it was)
+    all_step_outputs: dict[str, Any] = {}
+    steps_to_run = plan.steps
+    for i, step in enumerate(steps_to_run):
+        messages = build_messages(plan, step, incoming, all_step_outputs)
+        all_step_outputs[step_name(step, i)] = parse(await model(messages))
+
+    if plan.output_agents:
+        output_names = [n for n in plan.output_agents if isinstance(n, str)]
+    else:
+        output_names = [step_name(steps_to_run[-1], len(steps_to_run) - 1)]
+    answers: dict[str, Any] = {}
+    for n in output_names:
+        if n not in all_step_outputs:
+            continue
+        payload = all_step_outputs[n]
+        if isinstance(payload, dict):
+            for k, v in payload.items():
+                if k not in answers:
+                    answers[k] = v
+        elif n not in answers:
+            answers[n] = payload
+    return {"answers": answers}
+
+
+async def bounded_pipeline(plan: StepsPlan, incoming: Any, model: StubModel) -> dict:
+    """send_message with StepOutputs."""
+    steps_to_run = list(plan.steps)
+    outputs = StepOutputs(steps_to_run, plan.output_agents)
+    for i, step in enumerate(steps_to_run):
+        messages = build_messages(plan, step, incoming, outputs.blocks)
+        outputs.release(i)
+        text = await model(messages)
+        del messages
+        outputs.record(i, parse(text))
+    return {"answers": outputs.finish()}
+
+
+def measure(
+    pipeline: Callable[[StepsPlan, Any, StubModel], Awaitable[dict]],
+    plan: StepsPlan,
+    payloads: list[dict],
+    latency_ms: float,
+) -> tuple[int, float, list[dict]]:
+    """(peak bytes above the payloads, seconds, replies) for all payloads run concurrently."""
+    model = StubModel(latency_ms)
+
+    async def run_all() -> list[dict]:
+        return await asyncio.gather(*(pipeline(plan, p, model) for p in payloads))
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        replies = asyncio.run(run_all())
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak - base, elapsed, replies
+
+
+def kib(n: float) -> str:
+    return f"{n / 1024:,.0f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-message peak memory of the step pipeline.")
+    parser.add_argument("--steps", dest="steps_path", default=None, help="Steps JSON to run (default: a built-in 5-step plan).")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100], help="Payload sizes in KB.")
+    parser.add_argument("--concurrency", type=int, default=100, help="Scenarios in flight at once.")
+    parser.add_argument("--latency-ms", dest="latency_ms", type=float, default=50.0, help="Simulated model latency per call.")
+    parser.add_argument("--json", dest="json_out", default=None, help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    plan = load_steps_plan(args.steps_path) if args.steps_path else compile_steps_plan(BENCH_PLAN, source="<bench>")
+    print(f"plan: {plan.source} ({len(plan.steps)} steps), concurrency {args.concurrency}, model latency {args.latency_ms:.0f} ms")
+    print(f"{'size':>8} {'legacy KiB':>11} {'bounded KiB':>12} {'legacy/msg':>11} {'bounded/msg':>12} {'saved':>6}  same answers")
+
+    results: list[dict[str, Any]] = []
+    for kb in args.sizes:
+        template = {**make_scenario(kb, 0), "from": "bench-0"}
+        payloads = [copy.deepcopy(template) for _ in range(args.concurrency)]
+        legacy_peak, legacy_s, legacy_replies = measure(legacy_pipeline, plan, payloads, args.latency_ms)
+        bounded_peak, bounded_s, bounded_replies = measure(bounded_pipeline, plan, payloads, args.latency_ms)
+        n = max(1, args.concurrency)
+        same = legacy_replies == bounded_replies
+        saved: Optional[float] = 1 - bounded_peak / legacy_peak if legacy_peak else None
+        print(
+            f"{kb:>6}KB {kib(legacy_peak):>11} {kib(bounded_peak):>12} {kib(legacy_peak / n):>11} "
+            f"{kib(bounded_peak / n):>12} {saved * 100 if saved is not None else 0:>5.0f}%  {'yes' if same else 'NO'}"
+        )
+        results.append({
+            "payload_kb": kb,
+            "concurrency": args.concurrency,
+            "legacy_peak_bytes": legacy_peak,
+            "bounded_peak_bytes": bounded_peak,
+            "legacy_per_message_bytes": legacy_peak // n,
+            "bounded_per_message_bytes": bounded_peak // n,
+            "legacy_s": round(legacy_s, 3),
+            "bounded_s": round(bounded_s, 3),
+            "same_answers": same,
+        })
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"plan": plan.source, "results": results}, f, indent=2)
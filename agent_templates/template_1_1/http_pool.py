@@ -0,0 +1,145 @@
+import asyncio
+import importlib.util
+import json
+import time
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+# httpx is imported where the client is built: it comes with openai and is
+# just as slow to import, so it follows the same lazy path.
+if TYPE_CHECKING:
+    import httpx
+
+
+@dataclass(frozen=True)
+class OpenAIPoolConfig:
+    """
+    Connection-pool settings for the OpenAI HTTP client.
+    Read from the "openai_client" section of the client config JSON.
+    """
+    max_connections: int = 32
+    max_keepalive_connections: int = 16
+    keepalive_expiry_seconds: float = 60.0
+    http2: bool = True
+    timeout_seconds: float = 60.0
+    connect_timeout_seconds: float = 5.0
+    keepalive_ping_seconds: Optional[float] = None
+    metrics_interval_seconds: Optional[float] = None
+    base_url: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, raw: Any) -> "OpenAIPoolConfig":
+        if not isinstance(raw, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in raw.items() if k in known})
+
+
+def load_pool_config(config_path: Optional[str]) -> OpenAIPoolConfig:
+    """Return the "openai_client" section of the client config, or defaults."""
+    if not config_path:
+        return OpenAIPoolConfig()
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return OpenAIPoolConfig()
+    return OpenAIPoolConfig.from_dict(cfg.get("openai_client") if isinstance(cfg, dict) else None)
+
+
+def http2_available() -> bool:
+    """HTTP/2 in httpx needs the optional 'h2' package."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class PoolMetrics:
+    """Request-level counters used to judge how busy the connection pool is."""
+
+    def __init__(self, max_connections: int) -> None:
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_activity = time.monotonic()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": self.max_connections,
+            # Requests beyond max_connections wait for a free connection.
+            "peak_utilization": round(min(1.0, self.peak_in_flight / max(1, self.max_connections)), 3),
+            "peak_waiting_for_connection": max(0, self.peak_in_flight - self.max_connections),
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+def build_http_client(cfg: OpenAIPoolConfig, metrics: PoolMetrics) -> "httpx.AsyncClient":
+    """Build the shared httpx client handed to AsyncOpenAI(http_client=...)."""
+    import httpx
+
+    class MeteredTransport(httpx.AsyncBaseTransport):
+        def __init__(self, inner: httpx.AsyncBaseTransport) -> None:
+            self.inner = inner
+
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            metrics.requests += 1
+            metrics.in_flight += 1
+            metrics.peak_in_flight = max(metrics.peak_in_flight, metrics.in_flight)
+            try:
+                return await self.inner.handle_async_request(request)
+            except Exception:
+                metrics.errors += 1
+                raise
+            finally:
+                metrics.in_flight -= 1
+                metrics.last_activity = time.monotonic()
+
+        async def aclose(self) -> None:
+            await self.inner.aclose()
+
+    limits = httpx.Limits(
+        max_connections=cfg.max_connections,
+        max_keepalive_connections=cfg.max_keepalive_connections,
+        keepalive_expiry=cfg.keepalive_expiry_seconds,
+    )
+    inner = httpx.AsyncHTTPTransport(limits=limits, http2=bool(cfg.http2) and http2_available())
+    return httpx.AsyncClient(
+        transport=MeteredTransport(inner),
+        timeout=httpx.Timeout(cfg.timeout_seconds, connect=cfg.connect_timeout_seconds),
+    )
+
+
+async def keep_pool_warm(
+    ping: Callable[[], Awaitable[Any]],
+    metrics: PoolMetrics,
+    interval: float,
+    report: Callable[[str], Awaitable[Any]],
+) -> None:
+    """
+    Send a cheap request whenever the pool has been idle for `interval` seconds,
+    so the next real call does not pay TCP/TLS setup. Keep `interval` below the
+    provider's idle timeout and below keepalive_expiry_seconds.
+    """
+    while True:
+        idle = time.monotonic() - metrics.last_activity
+        if idle < interval:
+            await asyncio.sleep(interval - idle)
+            continue
+        try:
+            await ping()
+        except Exception as e:
+            await report(f"\033[33m[openai pool] keep-alive ping failed: {type(e).__name__}: {e}\033[0m")
+            metrics.last_activity = time.monotonic()
+
+
+async def report_pool_metrics(
+    metrics: PoolMetrics,
+    interval: float,
+    report: Callable[[str], Awaitable[Any]],
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await report(f"[openai pool] {json.dumps(metrics.snapshot())}")
@@ -0,0 +1,200 @@
+"""
+Local OpenAI-compatible stub for testing the runner without an API key.
+
+    python agent_templates/template_1_1/openai_stub.py --port 8900 --latency-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub python agent_templates/template_1_1/agent.py ...
+
+Implements POST /v1/chat/completions and GET /v1/models over HTTP/1.1 with
+keep-alive. GET /stub/stats returns connection and request counters, which is
+how you check that the runner reuses pooled connections.
+
+Prompt caching is simulated like the provider's: a prompt of at least 1024
+tokens (4096 characters here) whose leading 512-character blocks were seen
+before reports them as usage.prompt_tokens_details.cached_tokens.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+_QID = re.compile(r"\bQ\d{4}\b")
+
+# The stub counts 4 characters per token.
+CACHE_MIN_CHARS = 4096
+CACHE_BLOCK_CHARS = 512
+
+
+class StubStats:
+    def __init__(self) -> None:
+        self.connections_opened = 0
+        self.connections_open = 0
+        self.requests = 0
+        self.chat_completions = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def to_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+
+class OpenAIStub:
+    """
+    Minimal chat.completions server. Answers are fake but well-formed:
+    with response_format json_object, every QID found in the prompt gets an answer.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, completion_words: int = 12, cache_entries: int = 50_000) -> None:
+        self.latency_ms = latency_ms
+        self.completion_words = completion_words
+        self.cache_entries = cache_entries
+        self._prefixes: "OrderedDict[bytes, None]" = OrderedDict()
+        self.stats = StubStats()
+
+    def cached_chars(self, messages: list) -> int:
+        """Length of the longest previously seen prefix (whole blocks only); remembers this prompt's prefixes."""
+        text = "".join(
+            f"<{m.get('role')}>{m.get('content', '')}</{m.get('role')}>" for m in messages if isinstance(m, dict)
+        )
+        if len(text) < CACHE_MIN_CHARS or self.cache_entries <= 0:
+            return 0
+        h = hashlib.blake2b(digest_size=16)
+        hit = 0
+        missed = False
+        for end in range(CACHE_BLOCK_CHARS, len(text) + 1, CACHE_BLOCK_CHARS):
+            h.update(text[end - CACHE_BLOCK_CHARS:end].encode("utf-8"))
+            key = h.digest()
+            if key in self._prefixes:
+                self._prefixes.move_to_end(key)
+                if not missed:
+                    hit = end
+            else:
+                missed = True
+                self._prefixes[key] = None
+        while len(self._prefixes) > self.cache_entries:
+            self._prefixes.popitem(last=False)
+        return hit if hit >= CACHE_MIN_CHARS else 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections_opened += 1
+        self.stats.connections_open += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0") or 0))
+
+                self.stats.requests += 1
+                status, payload = await self.route(method, path.split("?", 1)[0], body)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    "content-type: application/json\r\n"
+                    f"content-length: {len(data)}\r\n"
+                    "connection: keep-alive\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            self.stats.connections_open -= 1
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[str, Any]:
+        if method == "GET" and path.endswith("/models"):
+            return "200 OK", {
+                "object": "list",
+                "data": [{"id": m, "object": "model", "owned_by": "stub"} for m in ("gpt-4o-mini", "gpt-4o")],
+            }
+        if method == "GET" and path == "/stub/stats":
+            return "200 OK", self.stats.to_dict()
+        if method == "POST" and path.endswith("/chat/completions"):
+            try:
+                req = json.loads(body or b"{}")
+            except ValueError:
+                return "400 Bad Request", {"error": {"message": "invalid JSON body"}}
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000)
+            self.stats.chat_completions += 1
+            return "200 OK", self.chat_completion(req)
+        return "404 Not Found", {"error": {"message": f"no route for {method} {path}"}}
+
+    def chat_completion(self, req: dict) -> dict:
+        messages = req.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if isinstance(m, dict))
+        words = " ".join(["stub"] * self.completion_words)
+
+        if (req.get("response_format") or {}).get("type") == "json_object":
+            qids = list(dict.fromkeys(_QID.findall(prompt)))
+            content = json.dumps({q: words for q in qids} if qids else {"answer": words})
+        else:
+            content = words
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        cached_tokens = min(prompt_tokens, self.cached_chars(messages) // 4)
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.cached_tokens += cached_tokens
+        completion_tokens = max(1, len(content) // 4)
+        finish_reason = "stop"
+        max_tokens: Optional[int] = req.get("max_tokens")
+        if max_tokens is not None and completion_tokens > max_tokens:
+            completion_tokens = max_tokens
+            finish_reason = "length"
+
+        return {
+            "id": f"chatcmpl-stub-{self.stats.chat_completions}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+
+async def serve(host: str, port: int, stub: OpenAIStub) -> asyncio.AbstractServer:
+    return await asyncio.start_server(stub.handle, host, port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8900, type=int)
+    parser.add_argument("--latency-ms", dest="latency_ms", default=0.0, type=float, help="Delay added to each chat completion.")
+    parser.add_argument("--completion-words", dest="completion_words", default=12, type=int, help="Words per fake answer.")
+    parser.add_argument("--cache-entries", dest="cache_entries", default=50_000, type=int, help="Prompt-cache blocks remembered (0 disables the simulated cache).")
+    args = parser.parse_args()
+
+    async def main() -> None:
+        server = await serve(args.host, args.port, OpenAIStub(args.latency_ms, args.completion_words, args.cache_entries))
+        print(f"OpenAI stub listening on http://{args.host}:{args.port}/v1")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Optional
+
+
+@dataclass(frozen=True)
+class PacerConfig:
+    """
+    Client-side send pacing. Read from the "pacing" section of the client config
+    JSON; the names mirror the server's hyper_parameters where they overlap.
+    Keep `rate_limit_msgs_per_minute` a bit below the server's value.
+    """
+    rate_limit_msgs_per_minute: float = 900.0
+    burst: int = 10
+    min_msgs_per_minute: float = 30.0
+    backoff_factor: float = 0.5          # rate multiplier on a throttle / flow-control warning
+    recovery_seconds: float = 30.0       # quiet time before the rate is raised again
+    throttle_pause_ms: float = 200.0
+    flow_control_pause_ms: float = 1000.0
+    quarantine_cooldown_secs: float = 600.0
+
+    @classmethod
+    def from_dict(cls, raw: Any) -> "PacerConfig":
+        if not isinstance(raw, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in raw.items() if k in known})
+
+
+def load_pacer_config(config_path: Optional[str]) -> Optional[PacerConfig]:
+    """Return the "pacing" section of the client config, or None (pacing off) if absent or null."""
+    if not config_path:
+        return None
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return None
+    raw = cfg.get("pacing") if isinstance(cfg, dict) else None
+    return PacerConfig.from_dict(raw) if isinstance(raw, dict) else None
+
+
+def classify_warning(text: str) -> str:
+    """Map a server "Warning: ..." message to throttle / flow_control / quarantine / other."""
+    lowered = text.lower()
+    if "quarantin" in lowered or "disconnect" in lowered:
+        return "quarantine"
+    if "flow" in lowered:
+        return "flow_control"
+    if "throttl" in lowered or "rate limit" in lowered or "slow down" in lowered:
+        return "throttle"
+    return "other"
+
+
+class ReplyPacer:
+    """
+    Token bucket in front of the send path.
+
+    Replies waiting for a token are released oldest request first, so a burst
+    is smoothed out without starving the messages closest to their deadline.
+    Server warnings cut the rate (and pause sends briefly); after
+    `recovery_seconds` without warnings the rate is doubled back up to the limit.
+    """
+
+    def __init__(self, cfg: PacerConfig) -> None:
+        self.cfg = cfg
+        self.max_rate = cfg.rate_limit_msgs_per_minute / 60.0
+        self.min_rate = min(self.max_rate, cfg.min_msgs_per_minute / 60.0)
+        self.rate = self.max_rate
+        self.tokens = float(cfg.burst)
+        self._last_refill = time.monotonic()
+        self._last_change = self._last_refill
+        self._paused_until = 0.0
+        self._waiters: list[tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.warnings = {"throttle": 0, "flow_control": 0, "quarantine": 0, "other": 0}
+
+    def _refill(self, now: float) -> None:
+        if self.rate < self.max_rate and now - self._last_change >= self.cfg.recovery_seconds:
+            self.rate = min(self.max_rate, self.rate * 2)
+            self._last_change = now
+        self.tokens = min(float(self.cfg.burst), self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self, received_at: float) -> float:
+        """Wait for a send token; `received_at` (monotonic) orders waiters. Returns the wait in seconds."""
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and now >= self._paused_until and self.tokens >= 1:
+            self.tokens -= 1
+            self.sent += 1
+            return 0.0
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (received_at, next(self._seq), fut))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        await fut
+
+        waited = time.monotonic() - now
+        self.sent += 1
+        self.delayed += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():  # skip waiters that were cancelled
+                self.tokens -= 1
+                fut.set_result(None)
+
+    def on_warning(self, text: str) -> str:
+        """Adapt to a server warning. Returns its kind."""
+        kind = classify_warning(text)
+        self.warnings[kind] += 1
+        now = time.monotonic()
+        if kind == "quarantine":
+            # Anything sent during the cooldown is refused; hold replies until it ends.
+            pause = self.cfg.quarantine_cooldown_secs
+            self.rate = self.min_rate
+        else:
+            pause = (self.cfg.flow_control_pause_ms if kind == "flow_control" else self.cfg.throttle_pause_ms) / 1000
+            self.rate = max(self.min_rate, self.rate * self.cfg.backoff_factor)
+        self._paused_until = max(self._paused_until, now + pause)
+        self.tokens = min(self.tokens, 0.0)
+        self._last_change = now
+        return kind
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "rate_msgs_per_minute": round(self.rate * 60, 1),
+            "sent": self.sent,
+            "delayed": self.delayed,
+            "avg_wait_ms": round(self.total_wait / self.delayed * 1000, 1) if self.delayed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "waiting": len(self._waiters),
+            "warnings": dict(self.warnings),
+        }
@@ -0,0 +1,445 @@
+"""
+Offline prompt-cost planner for a steps JSON.
+
+Renders every step against sample payloads, with earlier step outputs replaced
+by placeholders of known token size, and reports input tokens, the steps that
+would be cancelled by the MAX_INPUT_TOKENS guardrail, and a latency estimate.
+No OpenAI call is made.
+
+    python agent_templates/template_1_1/plan_cost.py \
+        --steps season_1/agent_<your_github_handle>.json --payloads corpus/
+
+--check-layout also reports, per payload, how many tokens every step's request
+shares (what the provider's prompt cache can reuse across steps), and sends each
+payload's steps through the local OpenAI stub (in-process) to check that, with
+stable_prefix, steps 2..n actually get cached tokens.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from openai_stub import CACHE_MIN_CHARS, OpenAIStub
+from safeguards import count_chat_tokens, get_encoding
+from steps_plan import (
+    PROMPT_LAYOUTS, StepOutputs, StepsPlan, build_messages, build_shared_prefix, compile_steps_plan,
+    load_steps_plan, normalize_response_format, sanitize_model, step_name,
+)
+from token_budget import TokenBudget, step_key
+
+# Season 1 limits (see "Season templates and limits" in the top-level README).
+SEASON_MAX_OPENAI_CALLS = 5
+SEASON_MAX_INPUT_TOKENS = 2000
+SEASON_MAX_OUTPUT_TOKENS = 600
+SEASON_DEADLINE_SECS = 60.0
+
+# Rough per-call latency model: fixed overhead + prefill + decode.
+# Order-of-magnitude figures for planning, not measurements.
+LATENCY_MODEL: dict[str, dict[str, float]] = {
+    "gpt-4o-mini": {"overhead_s": 0.35, "prefill_tok_s": 8000.0, "decode_tok_s": 90.0},
+    "gpt-4o":      {"overhead_s": 0.50, "prefill_tok_s": 5000.0, "decode_tok_s": 60.0},
+}
+
+# OpenAI caches prompt prefixes of at least this many tokens.
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def placeholder_output(tokens: int) -> str:
+    """A string of about `tokens` tokens (" x" is one token in cl100k/o200k)."""
+    if tokens <= 0:
+        return ""
+    return "x" + " x" * (tokens - 1)
+
+
+def estimate_latency(model: str, input_tokens: int, output_tokens: int) -> float:
+    m = LATENCY_MODEL.get(model, LATENCY_MODEL["gpt-4o-mini"])
+    return m["overhead_s"] + input_tokens / m["prefill_tok_s"] + output_tokens / m["decode_tok_s"]
+
+
+def iter_payloads(path: str) -> Iterator[tuple[str, Any]]:
+    """
+    Yield (label, payload) from a .json file (one payload), a .jsonl file
+    (one payload per line) or a directory of those.
+    """
+    if os.path.isdir(path):
+        for entry in sorted(os.listdir(path)):
+            if entry.endswith((".json", ".jsonl")):
+                yield from iter_payloads(os.path.join(path, entry))
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for n, line in enumerate(f, start=1):
+                if line.strip():
+                    yield f"{path}:{n}", json.loads(line)
+        else:
+            yield path, json.load(f)
+
+
+@dataclass
+class StepReport:
+    name: str
+    model: str
+    worst_tokens: list[int] = field(default_factory=list)
+    typical_tokens: list[int] = field(default_factory=list)
+    will_cancel: int = 0   # typical prompt already over the cap
+    may_cancel: int = 0    # only the worst-case prompt is over the cap
+    warnings: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "worst_input_tokens_max": max(self.worst_tokens, default=0),
+            "typical_input_tokens_p50": int(statistics.median(self.typical_tokens)) if self.typical_tokens else 0,
+            "typical_input_tokens_max": max(self.typical_tokens, default=0),
+            "will_cancel": self.will_cancel,
+            "may_cancel": self.may_cancel,
+            "warnings": self.warnings,
+        }
+
+
+@dataclass
+class LayoutReport:
+    """Per-payload prefix sharing across the steps of one plan (--check-layout)."""
+    layout: str
+    models: list[str]
+    payloads: int = 0
+    common_prefix_tokens: list[int] = field(default_factory=list)
+    stub_cached: list[list[int]] = field(default_factory=list)   # per payload, per step
+    failures: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        tokens = sorted(self.common_prefix_tokens)
+        steps = len(self.stub_cached[0]) if self.stub_cached else 0
+        return {
+            "layout": self.layout,
+            "payloads": self.payloads,
+            "common_prefix_tokens_min": tokens[0] if tokens else 0,
+            "common_prefix_tokens_p50": int(statistics.median(tokens)) if tokens else 0,
+            "cacheable_payloads": sum(1 for t in tokens if t >= PROMPT_CACHE_MIN_TOKENS),
+            "cache_min_tokens": PROMPT_CACHE_MIN_TOKENS,
+            "single_model": len(set(self.models)) <= 1,
+            # Cached prompt tokens the stub reported for each step (p50 over payloads).
+            "stub_cached_tokens_p50": [
+                int(statistics.median(c[i] for c in self.stub_cached)) for i in range(steps)
+            ],
+            "failures": self.failures,
+        }
+
+
+def request_text(messages: list[dict[str, str]]) -> str:
+    """The part of a request the prompt cache keys on, in order (as the stub hashes it)."""
+    return "".join(f"<{m['role']}>{m['content']}</{m['role']}>" for m in messages)
+
+
+def stub_cached_tokens(requests: list[tuple[str, list[dict[str, str]]]]) -> list[int]:
+    """Send one payload's step requests, in order, to a fresh in-process stub; cached_tokens per step."""
+    stub = OpenAIStub(cache_entries=10_000)
+    return [
+        stub.chat_completion({"model": model, "messages": messages})["usage"]["prompt_tokens_details"]["cached_tokens"]
+        for model, messages in requests
+    ]
+
+
+# Self-check of the layout against the stub: three steps with their own intros
+# over one long scenario. stable_prefix must give steps 2..3 cached tokens;
+# default must give none.
+_SELF_CHECK_PLAN: dict[str, Any] = {
+    "system_prompt": "You are a helpful assistant.",
+    "steps": [
+        {"name": "extract", "prompt_intro": "List the questions.", "include_incoming": "raw"},
+        {"name": "solve", "prompt_intro": "Answer the questions.", "include_incoming": "raw.scenario", "use_payload_from": ["extract"]},
+        {"name": "final", "prompt_intro": "Return the final JSON.", "include_incoming": "raw.questions", "use_payload_from": ["solve"]},
+    ],
+}
+_SELF_CHECK_PAYLOAD: dict[str, Any] = {
+    "raw": {
+        "scenario": "The supplier base is fragmented and risk is concentrated in peak season. " * 80,
+        "questions": {f"Q{i:04d}": "What should the team do first, and why?" for i in range(10)},
+    },
+}
+
+
+def layout_self_check() -> list[str]:
+    """Render the self-check plan in both layouts, send it through the stub, and return any failures."""
+    failures = []
+    for layout in PROMPT_LAYOUTS:
+        plan = compile_steps_plan({**_SELF_CHECK_PLAN, "prompt_layout": layout}, source="<self-check>")
+        shared = build_shared_prefix(_SELF_CHECK_PAYLOAD) if layout == "stable_prefix" else None
+        outputs: dict[str, str] = {}
+        requests = []
+        for i, step in enumerate(plan.steps):
+            requests.append(("gpt-4o-mini", build_messages(plan, step, _SELF_CHECK_PAYLOAD, outputs, shared)))
+            outputs[step_name(step, i)] = placeholder_output(100)
+        cached = stub_cached_tokens(requests)
+        if layout == "stable_prefix" and not all(c > 0 for c in cached[1:]):
+            failures.append(f"self-check: stable_prefix steps 2..n got cached tokens {cached[1:]} from the stub")
+        if layout == "default" and any(cached):
+            failures.append(f"self-check: default layout got cached tokens {cached} from the stub")
+    return failures
+
+
+class PlanCostPlanner:
+    """Renders a plan against payloads and aggregates per-step token estimates."""
+
+    def __init__(
+        self,
+        plan: StepsPlan,
+        max_calls: int = SEASON_MAX_OPENAI_CALLS,
+        max_input_tokens: int = SEASON_MAX_INPUT_TOKENS,
+        max_output_tokens: int = SEASON_MAX_OUTPUT_TOKENS,
+        typical_output_tokens: Optional[dict[str, int]] = None,
+        default_typical_output_tokens: int = SEASON_MAX_OUTPUT_TOKENS // 2,
+        default_model: str = "gpt-4o-mini",
+        budget: Optional[TokenBudget] = None,
+    ) -> None:
+        self.plan = plan
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.steps = list(plan.steps[:max_calls])
+        self.names = [step_name(s, i) for i, s in enumerate(self.steps)]
+        self.models = [sanitize_model(s.get("model", default_model)) for s in self.steps]
+        self.typical_out = {
+            n: min(max_output_tokens, (typical_output_tokens or {}).get(n, default_typical_output_tokens))
+            for n in self.names
+        }
+        # Worst case: the output cap, or the max_tokens the runner would send with --token-budget.
+        self.worst_out = {n: max_output_tokens for n in self.names}
+        if budget is not None:
+            # Steps whose cut reply the runner could not redo get the safe limit, as there.
+            no_spare = max_calls <= len(self.steps)
+            order = StepOutputs(self.steps, plan.output_agents).order
+            for step, n, m in zip(self.steps, self.names, self.models):
+                key = step_key(step, n, m)
+                learned = budget.expected_tokens(key)
+                if learned is not None:
+                    self.typical_out[n] = min(max_output_tokens, learned)
+                safe = no_spare and (normalize_response_format(step.get("response_format", "json")) == "json" or n in order)
+                self.worst_out[n] = min(max_output_tokens, budget.max_tokens(key, safe=safe))
+        self.worst_placeholder = {n: placeholder_output(t) for n, t in self.worst_out.items()}
+        self.typical_placeholder = {n: placeholder_output(t) for n, t in self.typical_out.items()}
+        self.reports = [StepReport(n, m) for n, m in zip(self.names, self.models)]
+        self.layout_report: Optional[LayoutReport] = None
+        self.payloads = 0
+        self._lint(len(plan.steps) - len(self.steps))
+
+    def _lint(self, skipped: int) -> None:
+        seen: set[str] = set()
+        for report, step in zip(self.reports, self.steps):
+            deps = step.get("use_payload_from", []) or []
+            for dep in deps if isinstance(deps, list) else []:
+                if dep not in seen:
+                    report.warnings.append(f"use_payload_from '{dep}' is not an earlier step: ignored by the runner")
+            if step.get("include_incoming", True) is True:
+                report.warnings.append("include_incoming is true (whole payload, incl. 'rendered')")
+            seen.add(report.name)
+        if skipped > 0 and self.reports:
+            self.reports[-1].warnings.append(f"{skipped} step(s) after this one never run (max {len(self.steps)} calls)")
+
+    def check_layout(self) -> None:
+        """Also collect prefix sharing across steps (see LayoutReport), starting with the stub self-check."""
+        self.layout_report = LayoutReport(self.plan.prompt_layout, self.models)
+        self.layout_report.failures.extend(layout_self_check())
+
+    def _layout(self, label: str, shared_prefix: Optional[str], requests: list[list[dict[str, str]]]) -> None:
+        lr = self.layout_report
+        assert lr is not None
+        lr.payloads += 1
+        texts = [request_text(m) for m in requests]
+        common = os.path.commonprefix(texts) if texts else ""
+        lr.common_prefix_tokens.append(len(get_encoding(self.models[0]).encode(common)) if common else 0)
+        cached = stub_cached_tokens(list(zip(self.models, requests)))
+        lr.stub_cached.append(cached)
+        if lr.layout != "stable_prefix" or len(requests) < 2 or not requests[0]:
+            return
+        # Once system prompt + shared prefix reach the stub's cache minimum,
+        # every later step must be served that prefix from the cache.
+        shared_chars = len(request_text(requests[0][:1])) + len(f"<{requests[0][-1]['role']}>{shared_prefix or ''}")
+        if shared_chars < CACHE_MIN_CHARS:
+            return
+        for name, c in list(zip(self.names, cached))[1:]:
+            if c == 0:
+                lr.failures.append(f"{label}: step '{name}' got no cached tokens from the stub")
+
+    def _tokens(self, messages: list[dict[str, str]], model: str) -> int:
+        return count_chat_tokens(messages, model=model)
+
+    def add_payload(self, incoming: Any, label: str = "") -> None:
+        self.payloads += 1
+        worst_outputs: dict[str, str] = {}
+        typical_outputs: dict[str, str] = {}
+        # Rendered once per payload, like the runner does.
+        shared_prefix = build_shared_prefix(incoming) if self.plan.prompt_layout == "stable_prefix" else None
+        typical_requests: list[list[dict[str, str]]] = []
+        for step, name, model, report in zip(self.steps, self.names, self.models, self.reports):
+            # Steps without dependencies render the same prompt in both cases:
+            # the token-count cache in safeguards makes the second count free.
+            worst = self._tokens(build_messages(self.plan, step, incoming, worst_outputs, shared_prefix), model)
+            typical_messages = build_messages(self.plan, step, incoming, typical_outputs, shared_prefix)
+            typical = self._tokens(typical_messages, model)
+            typical_requests.append(typical_messages)
+            report.worst_tokens.append(worst)
+            report.typical_tokens.append(typical)
+            if typical > self.max_input_tokens:
+                report.will_cancel += 1
+            elif worst > self.max_input_tokens:
+                report.may_cancel += 1
+            worst_outputs[name] = self.worst_placeholder[name]
+            typical_outputs[name] = self.typical_placeholder[name]
+        if self.layout_report is not None:
+            self._layout(label or f"payload {self.payloads}", shared_prefix, typical_requests)
+
+    def latency(self) -> dict[str, float]:
+        """Sequential latency (what the runner does) and the dependency critical path."""
+        worst_step: dict[str, float] = {}
+        typical_step: dict[str, float] = {}
+        for name, model, report in zip(self.names, self.models, self.reports):
+            worst_step[name] = estimate_latency(model, max(report.worst_tokens, default=0), self.worst_out[name])
+            typical_in = int(statistics.median(report.typical_tokens)) if report.typical_tokens else 0
+            typical_step[name] = estimate_latency(model, typical_in, self.typical_out[name])
+
+        # Longest chain through use_payload_from: the floor for any executor.
+        finish: dict[str, float] = {}
+        for step, name in zip(self.steps, self.names):
+            deps = step.get("use_payload_from", []) or []
+            start = max((finish[d] for d in deps if d in finish), default=0.0) if isinstance(deps, list) else 0.0
+            finish[name] = start + typical_step[name]
+
+        return {
+            "sequential_typical_s": round(sum(typical_step.values()), 2),
+            "sequential_worst_s": round(sum(worst_step.values()), 2),
+            "critical_path_typical_s": round(max(finish.values(), default=0.0), 2),
+            "deadline_s": SEASON_DEADLINE_SECS,
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        report = {
+            "steps_file": self.plan.source,
+            "prompt_layout": self.plan.prompt_layout,
+            "payloads": self.payloads,
+            "max_input_tokens": self.max_input_tokens,
+            "max_output_tokens": self.max_output_tokens,
+            "steps": [
+                {**r.to_dict(), "typical_output_tokens": self.typical_out[r.name], "max_output_tokens": self.worst_out[r.name]}
+                for r in self.reports
+            ],
+            "latency": self.latency(),
+        }
+        if self.layout_report is not None:
+            report["layout_check"] = self.layout_report.to_dict()
+        return report
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [
+        f"Plan: {report['steps_file']}  payloads: {report['payloads']}  "
+        f"input cap: {report['max_input_tokens']}  output cap: {report['max_output_tokens']}",
+        "",
+        f"{'step':<24} {'model':<12} {'typ p50':>8} {'typ max':>8} {'worst':>8}  status",
+    ]
+    for s in report["steps"]:
+        if s["will_cancel"]:
+            status = f"\033[31mCANCELLED for {s['will_cancel']}/{report['payloads']} payload(s)\033[0m"
+        elif s["may_cancel"]:
+            status = f"\033[33mmay cancel for {s['may_cancel']}/{report['payloads']} (worst case)\033[0m"
+        else:
+            status = "\033[32mok\033[0m"
+        lines.append(
+            f"{s['name']:<24} {s['model']:<12} {s['typical_input_tokens_p50']:>8} "
+            f"{s['typical_input_tokens_max']:>8} {s['worst_input_tokens_max']:>8}  {status}"
+        )
+        for w in s["warnings"]:
+            lines.append(f"{'':<24} \033[33m! {w}\033[0m")
+    lat = report["latency"]
+    lines += [
+        "",
+        f"Latency estimate: typical {lat['sequential_typical_s']} s, worst {lat['sequential_worst_s']} s "
+        f"(steps run sequentially; dependency critical path {lat['critical_path_typical_s']} s; "
+        f"deadline {lat['deadline_s']:.0f} s)",
+    ]
+    lc = report.get("layout_check")
+    if lc:
+        lines += [
+            "",
+            f"Prompt layout '{lc['layout']}': prefix shared by all steps p50 {lc['common_prefix_tokens_p50']} tokens, "
+            f"min {lc['common_prefix_tokens_min']}; {lc['cacheable_payloads']}/{lc['payloads']} payload(s) "
+            f"reach the {lc['cache_min_tokens']}-token cache minimum",
+        ]
+        lines.append(f"Stub cached tokens per step (p50): {lc['stub_cached_tokens_p50']}")
+        if not lc["single_model"]:
+            lines.append("\033[33m! steps use different models: the prompt cache is per model\033[0m")
+        for f in lc["failures"][:10]:
+            lines.append(f"\033[31m! {f}\033[0m")
+        if len(lc["failures"]) > 10:
+            lines.append(f"\033[31m! ... {len(lc['failures']) - 10} more\033[0m")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict per-step token usage of a steps JSON before running it.")
+    parser.add_argument("--steps", dest="steps_path", required=True, help="Steps JSON to analyse.")
+    parser.add_argument("--payloads", required=True, help="Payload .json, .jsonl, or a directory of them.")
+    parser.add_argument("--max-calls", dest="max_calls", type=int, default=SEASON_MAX_OPENAI_CALLS)
+    parser.add_argument("--max-input-tokens", dest="max_input_tokens", type=int, default=SEASON_MAX_INPUT_TOKENS)
+    parser.add_argument("--max-output-tokens", dest="max_output_tokens", type=int, default=SEASON_MAX_OUTPUT_TOKENS)
+    parser.add_argument(
+        "--typical-output-tokens",
+        dest="typical_output_tokens",
+        type=int,
+        default=SEASON_MAX_OUTPUT_TOKENS // 2,
+        help="Assumed size of an earlier step's output for the 'typical' estimate (worst case uses the output cap).",
+    )
+    parser.add_argument(
+        "--token-budget",
+        dest="budget_path",
+        default=None,
+        help="History file written by agent.py --token-budget: use each step's learned median and max_tokens.",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=PROMPT_LAYOUTS,
+        default=None,
+        help="Analyse the plan with this prompt_layout instead of the one in the steps JSON.",
+    )
+    parser.add_argument(
+        "--check-layout",
+        dest="check_layout",
+        action="store_true",
+        help="Check that every step's request starts with the same bytes and report the shared prefix size.",
+    )
+    parser.add_argument("--json", dest="as_json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    plan = load_steps_plan(args.steps_path)
+    if args.layout is not None:
+        plan = dataclasses.replace(plan, prompt_layout=args.layout)
+    planner = PlanCostPlanner(
+        plan,
+        max_calls=args.max_calls,
+        max_input_tokens=args.max_input_tokens,
+        max_output_tokens=args.max_output_tokens,
+        default_typical_output_tokens=args.typical_output_tokens,
+        budget=TokenBudget(args.budget_path, cap=args.max_output_tokens) if args.budget_path else None,
+    )
+    if args.check_layout:
+        planner.check_layout()
+    for label, payload in iter_payloads(args.payloads):
+        planner.add_payload(payload, label)
+
+    report = planner.to_dict()
+    report["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    if args.as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+        print(f"({report['payloads']} payload(s) analysed in {report['elapsed_s']} s)")
+
+    # Non-zero exit when some step is certain to be cancelled, or the layout check failed (handy in CI).
+    failed = any(s["will_cancel"] for s in report["steps"]) or bool(report.get("layout_check", {}).get("failures"))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,184 @@
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from types import FrameType
+from typing import Any, ContextManager, Iterator, Optional
+
+
+_SAFE_LABEL = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class NullProfile:
+    """Stand-in used when profiling is off: every call is a no-op."""
+
+    _ctx: ContextManager[None] = nullcontext()
+
+    def phase(self, name: str, step: Optional[str] = None) -> ContextManager[None]:
+        return self._ctx
+
+    def add(self, name: str, seconds: float, step: Optional[str] = None) -> None:
+        pass
+
+
+NULL_PROFILE = NullProfile()
+
+
+class MessageProfile:
+    """Phase timings and stack samples for one message."""
+
+    def __init__(self, seq: int, frame: FrameType, label: str) -> None:
+        self.seq = seq
+        self.label = label
+        self.frame = frame  # the send_message coroutine frame; identifies this message's stacks
+        self.t0 = time.perf_counter()
+        self.phases: list[tuple[str, Optional[str], float]] = []
+        self.samples: Counter = Counter()
+
+    @contextmanager
+    def phase(self, name: str, step: Optional[str] = None) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, step, time.perf_counter() - t))
+
+    def add(self, name: str, seconds: float, step: Optional[str] = None) -> None:
+        self.phases.append((name, step, seconds))
+
+    def breakdown(self, wall: float, reason: str, interval: float) -> dict[str, Any]:
+        totals: dict[str, float] = {}
+        for name, _, seconds in self.phases:
+            totals[name] = totals.get(name, 0.0) + seconds
+        waiting = sum(totals.get(k, 0.0) for k in ("openai", "queue_wait", "pace"))
+        return {
+            "seq": self.seq,
+            "label": self.label,
+            "reason": reason,
+            "wall_ms": round(wall * 1000, 2),
+            "totals_ms": {k: round(v * 1000, 2) for k, v in sorted(totals.items(), key=lambda kv: -kv[1])},
+            # Wall time not covered by any recorded phase.
+            "other_ms": round(max(0.0, wall - sum(totals.values())) * 1000, 2),
+            "waiting_ms": round(waiting * 1000, 2),
+            "phases": [
+                {"name": n, "step": s, "ms": round(v * 1000, 3)} for n, s, v in self.phases
+            ],
+            "stack_samples": sum(self.samples.values()),
+            "sample_interval_ms": interval * 1000,
+        }
+
+
+class MessageProfiler:
+    """
+    Profiles selected messages: every `every_n`-th one, and any message slower
+    than `threshold_ms`.
+
+    A sampling thread reads the event-loop thread's stack every `interval_ms`
+    and charges each sample to the message whose send_message coroutine is on
+    that stack. Samples only land while Python code runs on the loop, so they
+    show interpreter overhead (rendering, json, token counting, console I/O);
+    time spent awaiting the model appears in the phase breakdown instead.
+
+    For each selected message, <dir>/<seq>-<label>.folded (collapsed stacks,
+    ready for flamegraph.pl / speedscope) and <seq>-<label>.json (phase
+    breakdown) are written by the sampling thread, off the event loop.
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        every_n: int = 0,
+        threshold_ms: Optional[float] = None,
+        interval_ms: float = 5.0,
+    ) -> None:
+        self.out_dir = out_dir
+        self.every_n = every_n if every_n > 0 or threshold_ms is not None else 1
+        self.threshold = threshold_ms / 1000 if threshold_ms is not None else None
+        self.interval = interval_ms / 1000
+        self.written = 0
+        self._seq = 0
+        self._active: dict[int, MessageProfile] = {}
+        self._pending: "queue.SimpleQueue[Optional[tuple[MessageProfile, float, str]]]" = queue.SimpleQueue()
+        self._loop_thread = threading.get_ident()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling the calling thread (call it from the event-loop thread)."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._loop_thread = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="message-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write what is still pending, then stop the sampling thread."""
+        self._pending.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def begin(self, label: str) -> MessageProfile:
+        """Start profiling the calling coroutine (send_message)."""
+        self._seq += 1
+        frame = sys._getframe(1)
+        prof = MessageProfile(self._seq, frame, _SAFE_LABEL.sub("_", label)[:64])
+        self._active[id(frame)] = prof
+        return prof
+
+    def end(self, prof: MessageProfile) -> None:
+        self._active.pop(id(prof.frame), None)
+        wall = time.perf_counter() - prof.t0
+        if self.every_n and prof.seq % self.every_n == 0:
+            reason = f"every_{self.every_n}"
+        elif self.threshold is not None and wall >= self.threshold:
+            reason = f"over_{self.threshold * 1000:.0f}ms"
+        else:
+            return
+        prof.frame = None  # type: ignore[assignment]  # do not keep the coroutine alive
+        self._pending.put((prof, wall, reason))
+
+    # -- sampling thread ------------------------------------------------------
+    def _sample(self) -> None:
+        frame: Optional[FrameType] = sys._current_frames().get(self._loop_thread)
+        stack: list[str] = []
+        owner: Optional[MessageProfile] = None
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            if owner is None:
+                owner = self._active.get(id(frame))
+            frame = frame.f_back
+        if owner is not None:
+            owner.samples[";".join(reversed(stack))] += 1
+
+    def _write(self, prof: MessageProfile, wall: float, reason: str) -> None:
+        base = os.path.join(self.out_dir, f"{prof.seq:06d}-{prof.label}")
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in prof.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(prof.breakdown(wall, reason, self.interval), f, indent=2)
+        self.written += 1
+
+    def _run(self) -> None:
+        while True:
+            if self._active:
+                try:
+                    self._sample()
+                except Exception:
+                    pass  # a frame went away mid-walk; skip this sample
+            while True:
+                try:
+                    item = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    return
+                try:
+                    self._write(*item)
+                except OSError:
+                    pass
+            time.sleep(self.interval)
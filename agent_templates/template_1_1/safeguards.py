@@ -1,7 +1,75 @@
-from typing import Optional, Any
+from typing import TYPE_CHECKING, Optional, Any, Callable, Iterator
 from dataclasses import dataclass
-import tiktoken
+from functools import lru_cache
+import hashlib
 
+# tiktoken is imported inside get_encoding(): it is slow to import and only
+# needed once the first prompt is counted (or during the runner's warm-up).
+if TYPE_CHECKING:
+    import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> "tiktoken.Encoding":
+    """
+    Resolve (once per model) the tiktoken encoding used for token counting.
+    """
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Fallback if a brand-new model string is not yet mapped in tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class TokenCountCache:
+    """
+    Bounded memo of text -> token count, keyed by a 64-bit digest of
+    (encoding name, text) so the cache never holds the texts themselves.
+
+    `fallback` is an optional read-only lookup (e.g. a snapshot loaded at
+    startup) consulted on a miss before encoding the text.
+    """
+
+    def __init__(self, max_entries: int = 65536) -> None:
+        self.max_entries = max_entries
+        self.fallback: Optional[Callable[[int], Optional[int]]] = None
+        self.hits = 0
+        self.misses = 0
+        self._counts: dict[int, int] = {}
+
+    @staticmethod
+    def key(encoding_name: str, text: str) -> int:
+        h = hashlib.blake2b(encoding_name.encode("utf-8"), digest_size=8)
+        h.update(b"\0")
+        h.update(text.encode("utf-8", "surrogatepass"))
+        return int.from_bytes(h.digest(), "little")
+
+    def count(self, encoding: "tiktoken.Encoding", text: str) -> int:
+        k = self.key(encoding.name, text)
+        n = self._counts.get(k)
+        if n is None and self.fallback is not None:
+            n = self.fallback(k)
+        if n is not None:
+            self.hits += 1
+            return n
+
+        self.misses += 1
+        n = len(encoding.encode(text))
+        if len(self._counts) >= self.max_entries:
+            # Drop the oldest entry (dicts keep insertion order).
+            self._counts.pop(next(iter(self._counts)))
+        self._counts[k] = n
+        return n
+
+    def items(self) -> Iterator[tuple[int, int]]:
+        return iter(self._counts.items())
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+TOKEN_COUNT_CACHE = TokenCountCache()
 
 
 def count_chat_tokens(
@@ -12,11 +80,7 @@ def count_chat_tokens(
     Returns the number of tokens that will be sent as 'prompt_tokens'
     for a chat.completions call with the given messages.
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        # Fallback if a brand-new model string is not yet mapped in tiktoken
-        encoding = tiktoken.get_encoding("cl100k_base")
+    encoding = get_encoding(model)
 
     # Overhead rules adapted from the OpenAI cookbook
     if model.startswith("gpt-3.5-turbo-0301"):
@@ -38,7 +102,7 @@ def count_chat_tokens(
         total_tokens += tokens_per_message
         for key, val in msg.items():
             # Encode each field value
-            total_tokens += len(encoding.encode(val))
+            total_tokens += TOKEN_COUNT_CACHE.count(encoding, val)
             if key == "name":
                 total_tokens += tokens_per_name
 
@@ -105,11 +169,19 @@ def actual_chat_request_cost(
     )
 
 
+def _cached_tokens(details: Any) -> int:
+    """cached_tokens from prompt_tokens_details / input_tokens_details (may be missing or null)."""
+    if isinstance(details, dict):
+        return int(details.get("cached_tokens") or 0)
+    return int(getattr(details, "cached_tokens", 0) or 0)
+
+
 # Needed for newer openai models (gpt-5 family)
 def normalize_usage(usage_obj: Any) -> Optional[dict[str, int]]:
     """
     Normalize usage from OpenAI SDK responses into:
-      {"prompt_tokens": int, "completion_tokens": int, "total_tokens": int}
+      {"prompt_tokens": int, "completion_tokens": int, "total_tokens": int, "cached_tokens": int}
+    cached_tokens is the part of the prompt served from the provider's prompt cache (0 if not reported).
     Works for both Chat Completions and Responses API, when usage is present.
     Returns None if usage isn't available.
     """
@@ -143,14 +215,16 @@ def normalize_usage(usage_obj: Any) -> Optional[dict[str, int]]:
         prompt = int(d.get("prompt_tokens", 0))
         comp = int(d.get("completion_tokens", 0))
         total = int(d.get("total_tokens", prompt + comp))
-        return {"prompt_tokens": prompt, "completion_tokens": comp, "total_tokens": total}
+        cached = _cached_tokens(d.get("prompt_tokens_details"))
+        return {"prompt_tokens": prompt, "completion_tokens": comp, "total_tokens": total, "cached_tokens": cached}
 
     # Responses API often uses input/output wording
     if "input_tokens" in d or "output_tokens" in d:
         prompt = int(d.get("input_tokens", 0))
         comp = int(d.get("output_tokens", 0))
         total = int(d.get("total_tokens", prompt + comp))
-        return {"prompt_tokens": prompt, "completion_tokens": comp, "total_tokens": total}
+        cached = _cached_tokens(d.get("input_tokens_details"))
+        return {"prompt_tokens": prompt, "completion_tokens": comp, "total_tokens": total, "cached_tokens": cached}
 
     # Unknown/unsupported shape
     return None
@@ -162,12 +236,14 @@ class Usage:
     prompt_tokens: int
     completion_tokens: int
     total_tokens: int
+    cached_tokens: int = 0
 
     def to_dict(self) -> dict[str, int]:
         return {
             "prompt_tokens": self.prompt_tokens,
             "completion_tokens": self.completion_tokens,
             "total_tokens": self.total_tokens,
+            "cached_tokens": self.cached_tokens,
         }
 
 
@@ -191,7 +267,8 @@ def get_usage_from_response(response: Any) -> Optional[Usage]:
     prompt = int(norm.get("prompt_tokens", 0))
     comp = int(norm.get("completion_tokens", 0))
     total = int(norm.get("total_tokens", prompt + comp))
-    return Usage(prompt_tokens=prompt, completion_tokens=comp, total_tokens=total)
+    cached = int(norm.get("cached_tokens", 0))
+    return Usage(prompt_tokens=prompt, completion_tokens=comp, total_tokens=total, cached_tokens=cached)
 
 
 
@@ -210,10 +287,7 @@ def count_embedding_tokens(
     Returns the total number of tokens for a list of input strings
     when sent to the embeddings endpoint for model_name.
     """
-    try:
-        enc = tiktoken.encoding_for_model(model_name)
-    except KeyError:
-        enc = tiktoken.get_encoding("cl100k_base")
+    enc = get_encoding(model_name)
 
     # sum token counts for each string
     return sum(len(enc.encode(text)) for text in texts)
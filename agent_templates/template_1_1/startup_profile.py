@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Taken when the runner imports this module (its first import), i.e. as close
+# to "interpreter done, agent.py starts executing" as we can get portably.
+_T0 = time.perf_counter()
+
+
+class StartupProfile:
+    """
+    Wall-clock timeline of the runner's startup phases.
+    Phases are always recorded (a perf_counter call each); the report is only
+    printed with --profile-startup.
+    """
+
+    def __init__(self, t0: float = _T0) -> None:
+        self.t0 = t0
+        self.phases: list[tuple[str, float, float]] = []
+        self.marks: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start, time.perf_counter()))
+
+    def mark(self, name: str) -> float:
+        """Record a point in time (e.g. 'ready'); returns ms since t0."""
+        now = time.perf_counter()
+        self.marks[name] = now
+        return (now - self.t0) * 1000
+
+    def since_start(self, name: str) -> Optional[float]:
+        t = self.marks.get(name)
+        return None if t is None else (t - self.t0) * 1000
+
+    def report(self, target_ms: Optional[float] = None) -> str:
+        lines = ["[startup] phase                                  start ms   took ms"]
+        for name, start, end in sorted(self.phases, key=lambda p: p[1]):
+            lines.append(
+                f"[startup] {name:<38} {(start - self.t0) * 1000:>9.1f} {(end - start) * 1000:>9.1f}"
+            )
+        for name, t in sorted(self.marks.items(), key=lambda m: m[1]):
+            lines.append(f"[startup] -> {name:<35} {(t - self.t0) * 1000:>9.1f}")
+
+        ready = self.since_start("ready")
+        if target_ms is not None and ready is not None:
+            verdict = "OK" if ready <= target_ms else "OVER TARGET"
+            lines.append(f"[startup] time-to-ready {ready:.1f} ms (target {target_ms:.0f} ms): {verdict}")
+        return "\n".join(lines)
+
+
+STARTUP = StartupProfile()
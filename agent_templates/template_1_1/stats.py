@@ -0,0 +1,13 @@
+"""
+Small statistics helpers shared by the runner's tools (token budget, trace
+summary) and the InputAgent's load report.
+"""
+import math
+from typing import Optional
+
+
+def percentile(sorted_values: list, q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list (None when empty)."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(1, math.ceil(q / 100 * len(sorted_values))) - 1]
@@ -0,0 +1,415 @@
+import asyncio
+import json
+import os
+import signal
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+
+DEFAULT_SYSTEM_PROMPT = "You are an assistant helping other agents with their requests."
+
+# "prompt_layout" values. "stable_prefix" opens every step's prompt with the same
+# bytes (scenario, then questions) so provider-side prompt caching can hit.
+PROMPT_LAYOUTS = ("default", "stable_prefix")
+SHARED_INCOMING_PATHS = ("raw.scenario", "raw.questions")
+
+
+def sanitize_model(maybe_model: Any) -> str:
+    """
+    Hackathon restriction:
+      - Only 'gpt-4o-mini' or 'gpt-4o' allowed.
+      - Any other value becomes 'gpt-4o-mini'.
+    """
+    if maybe_model in ("gpt-4o-mini", "gpt-4o"):
+        return maybe_model
+    return "gpt-4o-mini"
+
+
+def normalize_response_format(value: Any) -> str:
+    """
+    Hackathon-friendly:
+      - Users choose 'json' or 'text'.
+      - Anything else defaults to 'json'.
+    """
+    if value == "text":
+        return "text"
+    return "json"
+
+
+def select_incoming_by_path(incoming: Any, path: str) -> Any:
+    """
+    Minimal dotted-path selector for hackathon configs.
+    Examples:
+      "raw" -> incoming["raw"]
+      "raw.questions" -> incoming["raw"]["questions"]
+    Missing path returns None.
+    """
+    cur = incoming
+    for part in path.split("."):
+        if isinstance(cur, dict) and part in cur:
+            cur = cur[part]
+        else:
+            return None
+    return cur
+
+
+def render_block(obj: Any) -> str:
+    """Render injected blocks in a prompt-friendly way."""
+    if obj is None:
+        return ""
+    if isinstance(obj, (dict, list)):
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return str(obj)
+
+
+def step_name(step: dict, index: int) -> str:
+    """Step name as used by use_payload_from / output_agents (agent_<n> if unnamed)."""
+    return step.get("name") or f"agent_{index+1}"
+
+
+def render_dependency(payload: Any) -> str:
+    """Render one earlier step output the way it is injected into later prompts."""
+    if isinstance(payload, (dict, list)):
+        return json.dumps(payload, ensure_ascii=False, indent=2)
+    return str(payload)
+
+
+def _incoming_block(step: dict, incoming: Any, strip_shared: bool = False) -> str:
+    """The part of the incoming payload a step asked for (include_incoming), rendered."""
+    include_spec = step.get("include_incoming", True)
+    if include_spec is True:
+        selected = incoming  # full payload (may be large)
+    elif isinstance(include_spec, str):
+        selected = select_incoming_by_path(incoming, include_spec)
+    else:
+        return ""
+
+    if strip_shared:
+        # stable_prefix layout: the shared fields already open the prompt; do not repeat them.
+        if include_spec in SHARED_INCOMING_PATHS:
+            return ""
+        raw = incoming.get("raw") if isinstance(incoming, dict) else None
+        if isinstance(raw, dict) and (include_spec is True or include_spec == "raw"):
+            rest = {k: v for k, v in raw.items() if f"raw.{k}" not in SHARED_INCOMING_PATHS}
+            selected = rest if include_spec == "raw" else {**incoming, "raw": rest}
+    return render_block(selected)
+
+
+def build_user_prompt(
+    step: dict,
+    incoming: Any,
+    step_outputs: Mapping[str, Any],
+    strip_shared: bool = False,
+) -> str:
+    """
+    Assemble a step's user prompt:
+      prompt_intro + incoming block + dependency block + prompt_ending
+    `step_outputs` holds the outputs of the steps that already ran (by name).
+    With `strip_shared`, fields that belong to the shared prefix are left out of the incoming block.
+    """
+    prompt_intro = step.get("prompt_intro", "") or ""
+    prompt_ending = step.get("prompt_ending", "") or ""
+    incoming_block = _incoming_block(step, incoming, strip_shared)
+
+    # Dependency payload joining: only previous agents count.
+    deps = step.get("use_payload_from", []) or []
+    joined_deps: list[str] = []
+    if isinstance(deps, list):
+        for dep_name in deps:
+            if dep_name in step_outputs:
+                joined_deps.append(render_dependency(step_outputs[dep_name]))
+
+    dep_block = "\n".join(joined_deps).strip()
+
+    pieces: list[str] = []
+    if prompt_intro.strip():
+        pieces.append(prompt_intro.strip())
+    if incoming_block.strip():
+        pieces.append(incoming_block)
+    if dep_block:
+        pieces.append(dep_block)
+    if prompt_ending.strip():
+        pieces.append(prompt_ending.strip())
+    return "\n\n".join(pieces).strip()
+
+
+def build_shared_prefix(incoming: Any) -> str:
+    """
+    stable_prefix layout: the content every step shares (scenario, then questions),
+    rendered the same way for every step so the prompts start byte-identical.
+    """
+    pieces: list[str] = []
+    for label, path in zip(("Scenario:", "Questions:"), SHARED_INCOMING_PATHS):
+        value = select_incoming_by_path(incoming, path)
+        if value is not None:
+            pieces.append(f"{label}\n{render_block(value)}")
+    return "\n\n".join(pieces)
+
+
+def build_messages(
+    plan: "StepsPlan",
+    step: dict,
+    incoming: Any,
+    step_outputs: Mapping[str, Any],
+    shared_prefix: Optional[str] = None,
+) -> list[dict[str, str]]:
+    """
+    System + user messages for one step, following plan.prompt_layout.
+
+    "default": the step's system prompt (or the plan's) and build_user_prompt().
+    "stable_prefix": the plan's system prompt for every step, then a user prompt
+    that opens with the shared prefix (pass `shared_prefix` to render it once per
+    payload) and ends with everything step-specific, including a per-step
+    system_prompt.
+    """
+    if plan.prompt_layout != "stable_prefix":
+        return [
+            {"role": "system", "content": step.get("system_prompt", plan.system_prompt)},
+            {"role": "user", "content": build_user_prompt(step, incoming, step_outputs)},
+        ]
+
+    if shared_prefix is None:
+        shared_prefix = build_shared_prefix(incoming)
+    tail = build_user_prompt(step, incoming, step_outputs, strip_shared=True)
+    own_system = step.get("system_prompt")
+    if isinstance(own_system, str) and own_system.strip() and own_system != plan.system_prompt:
+        tail = f"{own_system.strip()}\n\n{tail}" if tail else own_system.strip()
+    user = f"{shared_prefix}\n\n{tail}" if shared_prefix and tail else (shared_prefix or tail)
+    return [
+        {"role": "system", "content": plan.system_prompt},
+        {"role": "user", "content": user},
+    ]
+
+
+@dataclass(frozen=True)
+class StepsPlan:
+    """
+    Immutable view of one steps JSON file.
+    The runner swaps the whole object at once, so a pipeline that grabbed a
+    plan keeps running on it even if a newer one is installed meanwhile.
+    """
+    steps: tuple[dict, ...]
+    system_prompt: str
+    output_agents: tuple[str, ...]
+    source: str
+    mtime_ns: int
+    version: int = 0
+    prompt_layout: str = "default"
+
+
+def compile_steps_plan(cfg: Any, source: str = "<memory>", mtime_ns: int = 0, version: int = 0) -> StepsPlan:
+    """
+    Validate a parsed steps config and freeze it into a StepsPlan.
+    Raises ValueError with a participant-friendly message on bad input.
+    """
+    if not isinstance(cfg, dict):
+        raise ValueError("The steps JSON config must be an object.")
+
+    steps = cfg.get("steps", []) or []
+    output_agents = cfg.get("output_agents", []) or []
+    system_prompt = cfg.get("system_prompt", DEFAULT_SYSTEM_PROMPT)
+    prompt_layout = cfg.get("prompt_layout", "default") or "default"
+
+    if not isinstance(steps, list):
+        raise ValueError("'steps' must be a list in the steps JSON config.")
+    if not isinstance(output_agents, list):
+        raise ValueError("'output_agents' must be a list in the steps JSON config.")
+    if prompt_layout not in PROMPT_LAYOUTS:
+        raise ValueError(f"'prompt_layout' must be one of {', '.join(PROMPT_LAYOUTS)} in the steps JSON config.")
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise ValueError(f"Step #{i+1} must be an object in the steps JSON config.")
+
+    return StepsPlan(
+        steps=tuple(steps),
+        system_prompt=system_prompt,
+        output_agents=tuple(output_agents),
+        source=source,
+        mtime_ns=mtime_ns,
+        version=version,
+        prompt_layout=prompt_layout,
+    )
+
+
+def load_steps_plan(steps_path: str, version: int = 0) -> StepsPlan:
+    """Read, parse and compile a steps JSON file (blocking)."""
+    mtime_ns = os.stat(steps_path).st_mtime_ns
+    with open(steps_path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    return compile_steps_plan(cfg, source=steps_path, mtime_ns=mtime_ns, version=version)
+
+
+class StepOutputs:
+    """
+    Step outputs of one message, held only as long as the plan needs them.
+
+    From the steps that will run and the output agents, the constructor works
+    out which later step reads each output last (use_payload_from). A step's
+    output is then kept in two forms, each only if needed:
+
+    * `blocks[name]`: the rendered dependency block (render_dependency), built
+      once and dropped by `release(i)` right after its last reader is rendered.
+      Pass `blocks` as `step_outputs` to build_user_prompt / build_messages.
+    * output-agent payloads, merged into the answers as soon as every output
+      agent ahead of them in priority order is settled (first wins on key
+      conflicts, as before). Anything else is dropped when recorded.
+    """
+
+    def __init__(self, steps: list[dict], output_agents: tuple[str, ...]) -> None:
+        self.names = [step_name(s, i) for i, s in enumerate(steps)]
+        if output_agents:
+            order = [n for n in output_agents if isinstance(n, str)]
+        else:
+            order = [self.names[-1] if self.names else f"agent_{len(steps)}"]
+        self.order = list(dict.fromkeys(order))
+
+        # Which earlier step each use_payload_from entry resolves to, and the
+        # index of the last step that reads it.
+        last_reader: dict[int, int] = {}
+        latest: dict[str, int] = {}
+        for i, step in enumerate(steps):
+            deps = step.get("use_payload_from", []) or []
+            for dep in deps if isinstance(deps, list) else []:
+                if isinstance(dep, str) and dep in latest:
+                    last_reader[latest[dep]] = i
+            latest[self.names[i]] = i
+        self.read_later = [i in last_reader for i in range(len(steps))]
+        self.release_after: list[list[str]] = [[] for _ in steps]
+        for producer, reader in last_reader.items():
+            self.release_after[reader].append(self.names[producer])
+
+        # Output agents still to be produced; merged in priority order once settled.
+        self._producers_left = {n: self.names.count(n) for n in self.order}
+        self._pending: dict[str, Any] = {}
+        self._next = 0
+        self.answers: dict[str, Any] = {}
+        self.blocks: dict[str, str] = {}
+        self.recorded = 0
+
+    def release(self, index: int) -> None:
+        """Step `index` has been rendered: drop the blocks no later step reads."""
+        for name in self.release_after[index]:
+            self.blocks.pop(name, None)
+
+    def record(self, index: int, payload: Any) -> None:
+        """Store what the rest of the pipeline needs from step `index`'s output."""
+        name = self.names[index]
+        self.recorded += 1
+        if self.read_later[index]:
+            self.blocks[name] = render_dependency(payload)
+        if name in self._producers_left:
+            self._pending[name] = payload
+            self._producers_left[name] -= 1
+            self._merge_ready()
+
+    def finish(self) -> dict[str, Any]:
+        """No more steps will run (done or cancelled): merge what is left."""
+        for name in self._producers_left:
+            self._producers_left[name] = 0
+        self._merge_ready()
+        self.blocks.clear()
+        return self.answers
+
+    def _merge_ready(self) -> None:
+        while self._next < len(self.order):
+            name = self.order[self._next]
+            if self._producers_left[name] > 0:
+                return  # a later step still produces it; keep priority order
+            if name in self._pending:
+                payload = self._pending.pop(name)
+                if isinstance(payload, dict):
+                    for k, v in payload.items():
+                        if k not in self.answers:   # first wins
+                            self.answers[k] = v
+                elif name not in self.answers:      # first wins
+                    self.answers[name] = payload
+            self._next += 1
+
+
+class PlanReloader:
+    """
+    Watch a steps JSON file and hot-swap the plan without restarting the agent.
+
+    Reloads are triggered by an mtime change (polled every `interval` seconds)
+    or by SIGHUP on platforms that have it. Parsing and validation run in a
+    worker thread; the new plan is only installed (via `install`) once it has
+    compiled cleanly. Any failure is reported and the running plan is kept.
+    """
+
+    def __init__(
+        self,
+        steps_path: str,
+        current: StepsPlan,
+        install: Callable[[StepsPlan], None],
+        report: Callable[[str], Awaitable[Any]],
+        interval: float = 1.0,
+    ) -> None:
+        self.steps_path = steps_path
+        self.current = current
+        self.install = install
+        self.report = report
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, self._wakeup.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        self._task = loop.create_task(self._run())
+
+    def _changed_on_disk(self) -> bool:
+        try:
+            return os.stat(self.steps_path).st_mtime_ns != self.current.mtime_ns
+        except OSError:
+            return False
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+                forced = True
+            except asyncio.TimeoutError:
+                forced = False
+            self._wakeup.clear()
+
+            if forced or self._changed_on_disk():
+                try:
+                    await self.reload()
+                except Exception as e:
+                    # A reload must never take the running agent down.
+                    self.failures += 1
+                    await self.report(f"\033[31m[reload] unexpected error: {type(e).__name__}: {e}\033[0m")
+
+    async def reload(self) -> bool:
+        t0 = time.perf_counter()
+        try:
+            plan = await asyncio.to_thread(load_steps_plan, self.steps_path, self.current.version + 1)
+        except Exception as e:
+            self.failures += 1
+            # Remember the bad mtime so we do not retry the same broken file in a loop.
+            try:
+                self.current = replace(self.current, mtime_ns=os.stat(self.steps_path).st_mtime_ns)
+            except OSError:
+                pass
+            await self.report(
+                f"\033[31m[reload] failed after {(time.perf_counter() - t0) * 1000:.1f} ms, "
+                f"keeping plan v{self.current.version}: {type(e).__name__}: {e}\033[0m"
+            )
+            return False
+
+        self.install(plan)
+        self.current = plan
+        self.reloads += 1
+        await self.report(
+            f"\033[32m[reload] plan v{plan.version} installed from {self.steps_path} "
+            f"({len(plan.steps)} steps) in {(time.perf_counter() - t0) * 1000:.1f} ms\033[0m"
+        )
+        return True
+
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The runner's helper modules are flat files next to agent.py, imported by bare name.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
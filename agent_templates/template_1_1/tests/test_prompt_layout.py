@@ -0,0 +1,74 @@
+"""
+stable_prefix layout: every step's request must open with the same bytes
+(system prompt + scenario + questions), and the local stub's prompt cache
+must report cached tokens for steps 2..n. Rendering follows send_message:
+dependency blocks come from StepOutputs, the shared prefix is built once.
+"""
+from typing import Any
+
+import pytest
+
+from openai_stub import CACHE_MIN_CHARS
+from plan_cost import layout_self_check, request_text, stub_cached_tokens
+from steps_plan import StepOutputs, build_messages, build_shared_prefix, compile_steps_plan, step_name
+
+
+PLAN: dict[str, Any] = {
+    "system_prompt": "You are a helpful assistant. Be concise and correct.",
+    "output_agents": ["final_answer"],
+    "steps": [
+        {"name": "extract_task", "include_incoming": "raw.questions", "prompt_intro": "List the questions."},
+        {"name": "draft", "include_incoming": "raw.scenario", "use_payload_from": ["extract_task"], "prompt_intro": "Draft answers."},
+        {"name": "critique", "include_incoming": False, "use_payload_from": ["draft"], "system_prompt": "You are a strict reviewer.", "prompt_intro": "Critique the draft."},
+        {"name": "final_answer", "include_incoming": "raw", "use_payload_from": ["draft", "critique"], "prompt_intro": "Return the final JSON.", "prompt_ending": "JSON only."},
+    ],
+}
+
+PAYLOAD: dict[str, Any] = {
+    "raw": {
+        "scenario_id": "layout-1",
+        "scenario": "The supplier base is fragmented and risk is concentrated in peak season. " * 60,
+        "questions": {f"Q{i:02d}": f"What should the team do first about item {i}, and why?" for i in range(12)},
+        "points": {f"Q{i:02d}": 10 for i in range(12)},
+    },
+    "from": "tester",
+}
+
+
+def render(layout: str, per_step_prefix: bool = False) -> list[tuple[str, list[dict[str, str]]]]:
+    """(model, messages) for every step, with each step's output fed to the next."""
+    plan = compile_steps_plan({**PLAN, "prompt_layout": layout}, source="<test>")
+    steps = list(plan.steps)
+    outputs = StepOutputs(steps, plan.output_agents)
+    shared = build_shared_prefix(PAYLOAD) if layout == "stable_prefix" and not per_step_prefix else None
+    requests = []
+    for i, step in enumerate(steps):
+        requests.append(("gpt-4o-mini", build_messages(plan, step, PAYLOAD, outputs.blocks, shared)))
+        outputs.release(i)
+        outputs.record(i, {"step": step_name(step, i), "notes": f"output of step {i}"})
+    return requests
+
+
+@pytest.mark.parametrize("per_step_prefix", [False, True])
+def test_stable_prefix_is_byte_identical_across_steps(per_step_prefix: bool) -> None:
+    requests = render("stable_prefix", per_step_prefix)
+    expected = request_text([{"role": "system", "content": PLAN["system_prompt"]}]) + "<user>" + build_shared_prefix(PAYLOAD)
+    assert len(expected) >= CACHE_MIN_CHARS
+    for _, messages in requests:
+        assert request_text(messages).startswith(expected)
+    # The step-specific parts still differ.
+    assert len({request_text(m) for _, m in requests}) == len(requests)
+
+
+def test_stub_caches_steps_after_the_first() -> None:
+    cached = stub_cached_tokens(render("stable_prefix"))
+    assert cached[0] == 0
+    assert all(c > 0 for c in cached[1:]), cached
+
+
+def test_default_layout_gets_no_cache_hits() -> None:
+    assert stub_cached_tokens(render("default")) == [0] * len(PLAN["steps"])
+
+
+def test_layout_self_check_passes() -> None:
+    assert layout_self_check() == []
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import math
+import os
+from collections import deque
+from typing import Any, Optional
+
+from stats import percentile
+
+
+def step_key(step: dict, name: str, model: str) -> str:
+    """
+    History key of a step: name, model and a digest of its prompt fields, so
+    editing a prompt starts a fresh history instead of reusing stale numbers.
+    """
+    prompt = json.dumps(
+        [step.get("prompt_intro"), step.get("prompt_ending"), step.get("system_prompt"), step.get("response_format")],
+        ensure_ascii=False,
+    )
+    return f"{name}|{model}|{hashlib.blake2b(prompt.encode('utf-8'), digest_size=4).hexdigest()}"
+
+
+class StepHistory:
+    """Recent completion-token counts of one step, plus truncation state."""
+
+    def __init__(self, window: int, samples: Optional[list[int]] = None) -> None:
+        self.samples: deque = deque(samples or (), maxlen=window)
+        self.calls = 0
+        self.truncated = 0
+        self.floor = 0           # raised after a truncation, for `boost_calls` calls
+        self.boost_left = 0
+
+    def percentile(self, q: float) -> Optional[int]:
+        return percentile(sorted(self.samples), q)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "samples": list(self.samples),
+            "calls": self.calls,
+            "truncated": self.truncated,
+            "floor": self.floor,
+            "boost_left": self.boost_left,
+        }
+
+
+class TokenBudget:
+    """
+    Sizes max_tokens per step from the completion tokens it used before.
+
+    Until a step has `min_samples` observations it gets the full `cap`. After
+    that, max_tokens = `percentile` of its recent completions x `headroom`,
+    between `min_tokens` and `cap`. A truncated reply (finish_reason "length")
+    below the cap doubles the step's limit for the next `boost_calls` calls;
+    its token count is recorded as a (censored) sample so the percentile rises.
+
+    A caller that could not redo a cut reply asks for `safe=True`: the largest
+    completion in the window x `safe_headroom` instead of the percentile, so a
+    cut takes a reply well beyond anything the step produced recently.
+
+    The history is a small JSON file, loaded at start and saved periodically.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        cap: int,
+        percentile: float = 95.0,
+        headroom: float = 1.2,
+        min_tokens: int = 64,
+        min_samples: int = 20,
+        window: int = 500,
+        boost_calls: int = 20,
+        safe_headroom: float = 1.5,
+    ) -> None:
+        self.path = path
+        self.cap = cap
+        self.q = percentile
+        self.headroom = headroom
+        self.min_tokens = min(min_tokens, cap)
+        self.min_samples = min_samples
+        self.window = window
+        self.boost_calls = boost_calls
+        self.safe_headroom = safe_headroom
+        self.steps: dict[str, StepHistory] = {}
+        self.dirty = False
+        if path:
+            self.load()
+
+    def history(self, key: str) -> StepHistory:
+        h = self.steps.get(key)
+        if h is None:
+            h = self.steps[key] = StepHistory(self.window)
+        return h
+
+    def max_tokens(self, key: str, safe: bool = False) -> int:
+        h = self.steps.get(key)
+        if h is None or len(h.samples) < self.min_samples:
+            return self.cap
+        if safe:
+            p, headroom = max(h.samples), self.safe_headroom
+        else:
+            p, headroom = h.percentile(self.q) or self.cap, self.headroom
+        limit = max(self.min_tokens, math.ceil(p * headroom))
+        if h.boost_left > 0:
+            limit = max(limit, h.floor)
+        return min(self.cap, limit)
+
+    def expected_tokens(self, key: str, q: float = 50.0) -> Optional[int]:
+        """Typical completion size of a step (for cost and latency estimates)."""
+        h = self.steps.get(key)
+        return h.percentile(q) if h is not None else None
+
+    def record(self, key: str, completion_tokens: Optional[int], limit: int, finish_reason: Optional[str]) -> bool:
+        """Record one call. Returns True when the reply was cut by our own (learned) limit."""
+        h = self.history(key)
+        h.calls += 1
+        if completion_tokens is not None:
+            h.samples.append(int(completion_tokens))
+        self.dirty = True
+        if h.boost_left > 0:
+            h.boost_left -= 1
+        if finish_reason != "length":
+            return False
+        h.truncated += 1
+        if limit >= self.cap:
+            return False  # the season cap itself; nothing to adapt
+        h.floor = min(self.cap, limit * 2)
+        h.boost_left = self.boost_calls
+        return True
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            key: {
+                "max_tokens": self.max_tokens(key),
+                "safe_max_tokens": self.max_tokens(key, safe=True),
+                "p50": h.percentile(50),
+                f"p{self.q:g}": h.percentile(self.q),
+                "samples": len(h.samples),
+                "calls": h.calls,
+                "truncated": h.truncated,
+            }
+            for key, h in sorted(self.steps.items())
+        }
+
+    def load(self) -> None:
+        assert self.path is not None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, raw in (data.get("steps") or {}).items() if isinstance(data, dict) else ():
+            if not isinstance(raw, dict):
+                continue
+            h = StepHistory(self.window, [int(v) for v in raw.get("samples", []) if isinstance(v, (int, float))])
+            h.calls = int(raw.get("calls", 0))
+            h.truncated = int(raw.get("truncated", 0))
+            h.floor = int(raw.get("floor", 0))
+            h.boost_left = int(raw.get("boost_left", 0))
+            self.steps[key] = h
+
+    def state(self) -> dict[str, Any]:
+        """Plain data to save (take it on the event loop, write it anywhere)."""
+        self.dirty = False
+        return {"version": 1, "steps": {k: h.to_dict() for k, h in self.steps.items()}}
+
+
+def save_budget(path: str, state: dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
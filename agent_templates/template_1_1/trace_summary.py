@@ -0,0 +1,178 @@
+"""
+Summarize the spans exported by `agent.py --trace`.
+
+    python agent_templates/template_1_1/trace_summary.py traces/spans.jsonl
+
+Reads the file and its rotated backups (<file>.N ... <file>.1, oldest first),
+rebuilds each trace, and reports end-to-end latency plus where the critical
+path of a message spends its time (queue, render + token count inside a step,
+OpenAI calls, pacing, handoff to the Summoner sender).
+"""
+import argparse
+import glob
+import json
+import re
+import sys
+from collections import defaultdict
+from typing import Any, Iterator
+
+from stats import percentile
+
+
+_ROTATED = re.compile(r"\.(\d+)$")
+
+
+def span_files(path: str) -> list[str]:
+    backups = [p for p in glob.glob(glob.escape(path) + ".*") if _ROTATED.search(p)]
+    backups.sort(key=lambda p: int(_ROTATED.search(p).group(1)), reverse=True)  # type: ignore[union-attr]
+    return backups + [path]
+
+
+def iter_spans(path: str) -> Iterator[dict[str, Any]]:
+    for file in span_files(path):
+        try:
+            f = open(file, "r", encoding="utf-8")
+        except OSError:
+            continue
+        with f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of a file being written
+
+
+def label(span: dict[str, Any]) -> str:
+    step = (span.get("attrs") or {}).get("step")
+    return f"{span['name']}[{step}]" if step else span["name"]
+
+
+def critical_path(span: dict, children: dict[str, list[dict]]) -> list[tuple[str, float]]:
+    """
+    (label, ms) segments of the critical path under `span`: walking back from its
+    end, take the child that finished last, recurse into it, and continue from
+    its start. Time not covered by a child is the span's own.
+    """
+    start = span["start"]
+    cursor = start + span["duration_ms"] / 1000
+    segments: list[tuple[str, float]] = []
+    own = 0.0
+    for kid in sorted(children.get(span["span_id"], []), key=lambda k: k["start"] + k["duration_ms"] / 1000, reverse=True):
+        end = kid["start"] + kid["duration_ms"] / 1000
+        if end > cursor + 1e-6 or kid["start"] < start - 1e-6:
+            continue  # overlaps a later child (concurrent) or starts before its parent
+        own += cursor - end
+        segments = critical_path(kid, children) + segments
+        cursor = kid["start"]
+    own += cursor - start
+    if own > 0:
+        segments.append((label(span) + " (self)" if span.get("parent_id") else "other", own * 1000))
+    return segments
+
+
+def summarize(path: str, top: int = 5) -> dict[str, Any]:
+    traces: dict[str, list[dict]] = defaultdict(list)
+    for span in iter_spans(path):
+        traces[span["trace_id"]].append(span)
+
+    totals: list[float] = []
+    by_segment: dict[str, list[float]] = defaultdict(list)
+    openai_calls = 0
+    tokens = {"prompt": 0, "cached": 0, "completion": 0}
+    errors: dict[str, int] = defaultdict(int)
+    slowest: list[tuple[float, str, list[tuple[str, float]]]] = []
+
+    for trace_id, spans in traces.items():
+        root = next((s for s in spans if s.get("parent_id") is None), None)
+        if root is None:
+            continue
+        if root["attrs"].get("error"):
+            errors[root["attrs"]["error"]] += 1
+        children: dict[str, list[dict]] = defaultdict(list)
+        for s in spans:
+            if s.get("parent_id"):
+                children[s["parent_id"]].append(s)
+            if s["name"] == "openai":
+                openai_calls += 1
+                tokens["prompt"] += s["attrs"].get("prompt_tokens") or 0
+                tokens["cached"] += s["attrs"].get("cached_tokens") or 0
+                tokens["completion"] += s["attrs"].get("completion_tokens") or 0
+
+        path_segments = critical_path(root, children)
+        per_trace: dict[str, float] = defaultdict(float)
+        for name, ms in path_segments:
+            per_trace[name] += ms
+        for name, ms in per_trace.items():
+            by_segment[name].append(ms)
+        totals.append(root["duration_ms"])
+        slowest.append((root["duration_ms"], trace_id, path_segments))
+
+    totals.sort()
+    grand = sum(totals) or 1.0
+    segments = []
+    for name, values in by_segment.items():
+        values.sort()
+        segments.append({
+            "segment": name,
+            "share": round(sum(values) / grand, 4),
+            "mean_ms": round(sum(values) / len(totals), 1),
+            "p50_ms": round(percentile(values, 50) or 0.0, 1),
+            "p99_ms": round(percentile(values, 99) or 0.0, 1),
+        })
+    segments.sort(key=lambda s: -s["share"])
+    slowest.sort(key=lambda t: -t[0])
+
+    return {
+        "traces": len(totals),
+        "errors": dict(errors),
+        "end_to_end_ms": {
+            "p50": percentile(totals, 50),
+            "p90": percentile(totals, 90),
+            "p99": percentile(totals, 99),
+            "max": totals[-1] if totals else None,
+        },
+        "openai_calls": openai_calls,
+        "tokens": tokens,
+        "critical_path": segments,
+        "slowest": [
+            {"trace_id": tid, "ms": ms, "path": [[n, round(v, 1)] for n, v in segs]}
+            for ms, tid, segs in slowest[:top]
+        ],
+    }
+
+
+def format_summary(s: dict[str, Any]) -> str:
+    e = s["end_to_end_ms"]
+    lines = [
+        f"{s['traces']} trace(s), {s['openai_calls']} OpenAI call(s), "
+        f"{s['tokens']['prompt']} prompt ({s['tokens']['cached']} cached) / {s['tokens']['completion']} completion tokens"
+        + (f", errors: {s['errors']}" if s["errors"] else ""),
+        f"end-to-end: p50 {e['p50']} ms, p90 {e['p90']} ms, p99 {e['p99']} ms, max {e['max']} ms",
+        "",
+        f"{'critical-path segment':<40} {'share':>7} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}",
+    ]
+    for seg in s["critical_path"]:
+        lines.append(
+            f"{seg['segment']:<40} {seg['share'] * 100:>6.1f}% {seg['mean_ms']:>10} {seg['p50_ms']:>10} {seg['p99_ms']:>10}"
+        )
+    if s["slowest"]:
+        lines += ["", "slowest traces:"]
+        for t in s["slowest"]:
+            path = " -> ".join(f"{n} {v:.0f}" for n, v in t["path"] if v >= 1)
+            lines.append(f"  {t['trace_id']}  {t['ms']:.0f} ms: {path}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize trace spans exported by agent.py --trace.")
+    parser.add_argument("path", help="Span file written by --trace (rotated backups are read too).")
+    parser.add_argument("--top", type=int, default=5, help="How many of the slowest traces to list.")
+    parser.add_argument("--json", dest="as_json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args()
+
+    summary = summarize(args.path, top=args.top)
+    if not summary["traces"]:
+        print(f"No traces found in {args.path}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(summary, indent=2) if args.as_json else format_summary(summary))
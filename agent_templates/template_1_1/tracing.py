@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attrs")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attrs: dict[str, Any]) -> None:
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict[str, Any]:
+        end = self.end if self.end is not None else time.time()
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "attrs": self.attrs,
+        }
+
+
+class NullSpan(Span):
+    """The span NullTrace hands out: shared, so it never records anything."""
+
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+class NullTrace:
+    """Stand-in used when tracing is off: every call is a no-op."""
+
+    trace_id: Optional[str] = None
+    _span = NullSpan("", None, "", {})
+
+    def start(self, name: str, parent: Optional[Span] = None, **attrs: Any) -> Span:
+        return self._span
+
+    def end(self, span: Span, **attrs: Any) -> None:
+        pass
+
+    def end_open(self, name: str, **attrs: Any) -> None:
+        pass
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attrs: Any) -> Iterator[Span]:
+        yield self._span
+
+    def finish(self, **attrs: Any) -> None:
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class Trace:
+    """
+    All spans of one incoming payload. The root span ("message") starts in the
+    receive hook and ends when the reply reaches the send hook (or when the
+    message is dropped); the whole trace is exported at that point.
+    """
+
+    def __init__(self, tracer: "Tracer", trace_id: str, **attrs: Any) -> None:
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.root = Span(trace_id, None, "message", attrs)
+        self.spans: list[Span] = [self.root]
+
+    def start(self, name: str, parent: Optional[Span] = None, **attrs: Any) -> Span:
+        span = Span(self.trace_id, (parent or self.root).span_id, name, attrs)
+        self.spans.append(span)
+        return span
+
+    def end(self, span: Span, **attrs: Any) -> None:
+        if attrs:
+            span.attrs.update(attrs)
+        if span.end is None:
+            span.end = time.time()
+
+    def end_open(self, name: str, **attrs: Any) -> None:
+        """End the still-open spans called `name` (spans started in one handler, ended in another)."""
+        for span in self.spans:
+            if span.name == name and span.end is None:
+                self.end(span, **attrs)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attrs: Any) -> Iterator[Span]:
+        span = self.start(name, parent, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.end(span)
+
+    def finish(self, **attrs: Any) -> None:
+        """End the root (and anything left open) and hand the spans to the exporter."""
+        if self.root.end is not None:
+            return
+        self.root.attrs.update(attrs)
+        now = time.time()
+        for span in self.spans:
+            if span.end is None:
+                span.attrs.setdefault("unfinished", True)
+                span.end = now
+        self.root.attrs.pop("unfinished", None)
+        self.tracer.active.pop(self.trace_id, None)
+        self.tracer.exporter.export([s.to_dict() for s in self.spans])
+
+
+class Tracer:
+    def __init__(self, exporter: "JsonlSpanExporter") -> None:
+        self.exporter = exporter
+        self.active: dict[str, Trace] = {}
+
+    def begin(self, trace_id: Optional[str] = None, **attrs: Any) -> Trace:
+        """
+        Start a trace; reuse the sender's trace id when the payload carries one.
+        If that id is already in flight (a replayed or resent payload), the new
+        trace gets a fresh id and keeps the sender's as `upstream_trace_id`.
+        """
+        if trace_id and trace_id in self.active:
+            attrs["upstream_trace_id"] = trace_id
+            trace_id = None
+        trace = Trace(self, trace_id or uuid.uuid4().hex, **attrs)
+        self.active[trace.trace_id] = trace
+        return trace
+
+    def get(self, trace_id: Any) -> Any:
+        """The active Trace for `trace_id`, or NULL_TRACE."""
+        return self.active.get(trace_id, NULL_TRACE) if isinstance(trace_id, str) else NULL_TRACE
+
+
+class JsonlSpanExporter:
+    """
+    Buffers finished spans in memory; a background thread appends them to a JSONL
+    file in batches, every `flush_interval` seconds or once `batch_size` spans are
+    waiting. The file rotates like logging's RotatingFileHandler
+    (<path>.1 ... <path>.<backup_count>).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 10_000_000,
+        backup_count: int = 3,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.exported = 0
+        self.dropped = 0
+        self._buffer: deque = deque()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: list[dict[str, Any]]) -> None:
+        """Called on the event loop: only an append (deque appends are thread-safe)."""
+        self._buffer.extend(spans)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _rotate(self) -> None:
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _flush(self) -> None:
+        lines = []
+        while self._buffer:
+            lines.append(json.dumps(self._buffer.popleft(), ensure_ascii=False, default=str))
+        if not lines:
+            return
+        try:
+            if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            self.exported += len(lines)
+        except OSError:
+            self.dropped += len(lines)
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush()
+        self._flush()
@@ -0,0 +1,212 @@
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from typing import Any, Iterable, Optional
+
+
+# -----------------------------------------------------------------------------
+# Durable spool of buffered payloads
+# -----------------------------------------------------------------------------
+class MessageSpool:
+    """
+    Append-only JSONL log of the payloads sitting in `message_buffer`.
+
+    Each received payload is written as {"op": "put", "id": n, "payload": ...}
+    before it is queued, and {"op": "ack", "id": n} is appended once the send
+    handler is done with it. On restart, `recover()` returns every put that was
+    never acked (in arrival order) and compacts the file down to those entries.
+    """
+
+    def __init__(self, path: str, fsync: bool = False) -> None:
+        self.path = path
+        self.fsync = fsync
+        self.pending = 0
+        self._next_id = 1
+        self._fh = None
+
+    def recover(self) -> list[tuple[int, Any]]:
+        pending: dict[int, Any] = {}
+        last_id = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash: everything before it is still valid.
+                        continue
+                    if not isinstance(rec, dict) or not isinstance(rec.get("id"), int):
+                        continue
+                    last_id = max(last_id, rec["id"])
+                    if rec.get("op") == "put":
+                        pending[rec["id"]] = rec.get("payload")
+                    elif rec.get("op") == "ack":
+                        pending.pop(rec["id"], None)
+
+        recovered = sorted(pending.items())
+        self._next_id = last_id + 1
+        self._rewrite(recovered)
+        self.pending = len(recovered)
+        return recovered
+
+    def _rewrite(self, entries: Iterable[tuple[int, Any]]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for spool_id, payload in entries:
+                f.write(json.dumps({"op": "put", "id": spool_id, "payload": payload}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, rec: dict) -> None:
+        assert self._fh is not None, "call recover() before using the spool"
+        self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+
+    def append(self, payload: Any) -> int:
+        spool_id = self._next_id
+        self._next_id += 1
+        self._write({"op": "put", "id": spool_id, "payload": payload})
+        self.pending += 1
+        return spool_id
+
+    def ack(self, spool_id: int) -> None:
+        self._write({"op": "ack", "id": spool_id})
+        self.pending -= 1
+        # Nothing left to replay: start the log over instead of growing forever.
+        if self.pending == 0 and self._fh is not None and self._fh.tell() > 1_000_000:
+            self._fh.close()
+            self._rewrite([])
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+# -----------------------------------------------------------------------------
+# Memory-mappable snapshot of plan + token-count cache
+# -----------------------------------------------------------------------------
+# Layout (little endian):
+#   magic "SMWS" | format u32 | plan_len u32 | n u32 | plan JSON | pad to 8
+#   | n x u64 keys (sorted) | n x u32 token counts
+_MAGIC = b"SMWS"
+_FORMAT = 1
+_HEADER = struct.Struct("<4sIII")
+
+
+class WarmSnapshot:
+    """
+    Read-only view over a snapshot file. The token-count table is used in
+    place through mmap (binary search over the sorted keys), so loading costs
+    a header parse regardless of how many entries the file holds.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, fmt, plan_len, n = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or fmt != _FORMAT:
+            self._mm.close()
+            raise ValueError(f"{path} is not a warm-start snapshot (format {_FORMAT}).")
+        if len(self._mm) < _align8(_HEADER.size + plan_len) + 12 * n:
+            self._mm.close()
+            raise ValueError(f"{path} is truncated.")
+
+        off = _HEADER.size
+        self.plan: Optional[dict] = json.loads(self._mm[off:off + plan_len]) if plan_len else None
+        off = _align8(off + plan_len)
+        self._view = memoryview(self._mm)
+        self._keys = self._view[off:off + 8 * n].cast("Q")
+        self._counts = self._view[off + 8 * n:off + 12 * n].cast("I")
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def lookup(self, key: int) -> Optional[int]:
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._counts[i]
+        return None
+
+    def items(self) -> Iterable[tuple[int, int]]:
+        return zip(self._keys, self._counts)
+
+    def close(self) -> None:
+        """Unmap the file. Afterwards the snapshot behaves as an empty one."""
+        if self._mm.closed:
+            return
+        for view in (self._keys, self._counts, self._view):
+            view.release()
+        self._keys = self._counts = ()
+        self._mm.close()
+
+
+def save_snapshot(
+    path: str,
+    plan: Optional[dict],
+    token_counts: Iterable[tuple[int, int]],
+    max_entries: int = 262144,
+    commit: bool = True,
+) -> int:
+    """
+    Atomically write a snapshot file. Returns the number of token counts stored.
+    Later entries in `token_counts` win (pass fresh entries last).
+
+    With commit=False the new file is left next to `path` and only moved into
+    place by commit_snapshot(), so the caller can unmap the old one first.
+    """
+    table: dict[int, int] = {}
+    for k, v in token_counts:
+        table[k] = v
+    if len(table) > max_entries:
+        table = dict(list(table.items())[-max_entries:])
+    keys = sorted(table)
+
+    plan_bytes = json.dumps(plan, ensure_ascii=False).encode("utf-8") if plan is not None else b""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _FORMAT, len(plan_bytes), len(keys)))
+        f.write(plan_bytes)
+        f.write(b"\0" * (_align8(_HEADER.size + len(plan_bytes)) - _HEADER.size - len(plan_bytes)))
+        f.write(struct.pack(f"<{len(keys)}Q", *keys))
+        f.write(struct.pack(f"<{len(keys)}I", *(min(table[k], 0xFFFFFFFF) for k in keys)))
+        f.flush()
+        os.fsync(f.fileno())
+    if commit:
+        commit_snapshot(path)
+    return len(keys)
+
+
+def commit_snapshot(path: str) -> None:
+    """
+    Move a file written by save_snapshot(commit=False) into place. Close any
+    WarmSnapshot of `path` first: Windows refuses to replace a mapped file.
+    """
+    os.replace(path + ".tmp", path)
+
+
+def load_snapshot(path: str) -> Optional[WarmSnapshot]:
+    """Return the snapshot at `path`, or None if it is missing or unreadable."""
+    try:
+        return WarmSnapshot(path)
+    except (OSError, ValueError, TypeError, struct.error):
+        return None
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
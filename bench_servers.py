@@ -0,0 +1,367 @@
+"""
+Server-vs-server benchmark: the same agent traffic against each server config.
+
+    python bench_servers.py \
+        --configs configs/server_config.json configs/server_config_python.json \
+        --worker-threads 1 2 4 --agents 1 4 --sizes 1 16 --count 200 --concurrency 16
+
+For every combination of server config x worker_threads x agents x message size:
+  1. server.py is started with a copy of the config (port, worker_threads and
+     --set overrides applied, logs written under --out),
+  2. `agents` template_1_1 runners connect, backed by the local OpenAI stub
+     (one single-step plan, so the LLM side stays cheap and constant),
+  3. the InputAgent in script mode probes until every runner answers, then
+     sends `count` scenarios of about `size` KB and writes its load report
+     (throughput, latency percentiles, timeouts),
+  4. the server process is sampled for CPU time and resident memory over the
+     window the load report covers.
+
+The size is made up in raw.scenario, which the plan does not read: every
+size sends the same small prompt, well under the runner's input guardrail,
+so only the transport differs. A run where a runner still cancelled a reply
+(or the probe went unanswered) is marked invalid.
+
+Every runner answers every request (the server broadcasts), so `agents` is
+also the reply fan-out: the InputAgent waits for `agents` replies per request
+and reports reply counts and latency to the last reply. The runners start
+with --ignore-replies, so they do not answer each other's broadcast replies.
+Results go to <out>/report.json, one entry per run.
+worker_threads only applies to configs that have it (the Rust backend).
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(ROOT, "agent_templates", "template_1_1")
+TEMPLATE_AGENT = os.path.join(TEMPLATE_DIR, "agent.py")
+OPENAI_STUB = os.path.join(TEMPLATE_DIR, "openai_stub.py")
+INPUT_AGENT = os.path.join(ROOT, "agent_InputAgent", "agent.py")
+
+# Synthetic scenarios come from the template's memory benchmark (same payload shape).
+sys.path.append(TEMPLATE_DIR)
+from bench_memory import make_scenario  # noqa: E402
+
+# One call per message: enough to exercise the runner without dominating the run.
+BENCH_STEPS = {
+    "system_prompt": "Answer each question id with a short sentence. Return a JSON object.",
+    "output_agents": ["answer"],
+    "steps": [{
+        "name": "answer",
+        "prompt_intro": "Questions:",
+        "include_incoming": "raw.questions",
+        "use_payload_from": [],
+        "prompt_ending": "Return JSON only.",
+        "model": "gpt-4o-mini",
+        "response_format": "json",
+    }],
+}
+
+
+# -----------------------------------------------------------------------------
+# Process sampling (psutil when installed, /proc otherwise)
+# -----------------------------------------------------------------------------
+def psutil_available() -> bool:
+    return importlib.util.find_spec("psutil") is not None
+
+
+class ProcessSampler:
+    """Tracks CPU seconds and peak RSS of one process."""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.peak_rss_mb = 0.0
+        self._proc: Any = None
+        if psutil_available():
+            import psutil
+            self._proc = psutil.Process(pid)
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            if self._proc is not None:
+                t = self._proc.cpu_times()
+                return t.user + t.system
+            with open(f"/proc/{self.pid}/stat", "r") as f:
+                parts = f.read().rsplit(")", 1)[1].split()
+            return (int(parts[11]) + int(parts[12])) / self._ticks
+        except Exception:
+            return None
+
+    def rss_mb(self) -> Optional[float]:
+        try:
+            if self._proc is not None:
+                return self._proc.memory_info().rss / 2**20
+            with open(f"/proc/{self.pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except Exception:
+            return None
+        return None
+
+    def sample(self) -> None:
+        rss = self.rss_mb()
+        if rss is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+
+
+# -----------------------------------------------------------------------------
+# Helpers
+# -----------------------------------------------------------------------------
+def set_key(cfg: dict, dotted: str, value: Any) -> None:
+    node = cfg
+    *path, last = dotted.split(".")
+    for key in path:
+        node = node.setdefault(key, {})
+    node[last] = value
+
+
+def parse_override(text: str) -> tuple[str, Any]:
+    key, sep, raw = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"--set expects KEY=VALUE, got {text!r}")
+    try:
+        return key, json.loads(raw)
+    except ValueError:
+        return key, raw
+
+
+def wait_for_port(host: str, port: int, timeout: float, proc: subprocess.Popen) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"process exited with code {proc.returncode} before listening on {port}")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on {host}:{port} after {timeout} s")
+
+
+def stop(proc: Optional[subprocess.Popen], grace: float = 5.0) -> None:
+    if proc is None or proc.poll() is not None:
+        return
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(grace)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def sample_before(samples: list[tuple[float, Optional[float]]], t: float) -> tuple[float, Optional[float]]:
+    """The last (time, value) sample taken at or before `t` (the first sample if none was)."""
+    for sample in reversed(samples):
+        if sample[0] <= t:
+            return sample
+    return samples[0] if samples else (t, None)
+
+
+def write_json(path: str, data: Any) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+# -----------------------------------------------------------------------------
+# One run
+# -----------------------------------------------------------------------------
+def run_once(args: argparse.Namespace, server_cfg: dict, label: str, agents: int, kb: int) -> dict:
+    run_dir = os.path.join(args.out, label, f"agents{agents}_{kb}kb")
+    os.makedirs(run_dir, exist_ok=True)
+
+    cfg = json.loads(json.dumps(server_cfg))
+    cfg["host"], cfg["port"] = args.host, args.port
+    set_key(cfg, "logger.log_file_path", os.path.join(run_dir, "logs") + os.sep)
+    set_key(cfg, "logger.enable_console_log", False)
+    server_cfg_path = write_json(os.path.join(run_dir, "server_config.json"), cfg)
+
+    with open(os.path.join(ROOT, "configs", "client_config.json"), "r", encoding="utf-8") as f:
+        client_cfg = json.load(f)
+    set_key(client_cfg, "logger.log_file_path", os.path.join(run_dir, "logs") + os.sep)
+    set_key(client_cfg, "logger.enable_console_log", False)
+    client_cfg["pacing"] = None  # measure the server, not client-side pacing
+    client_cfg_path = write_json(os.path.join(run_dir, "client_config.json"), client_cfg)
+
+    steps_path = write_json(os.path.join(run_dir, "steps.json"), BENCH_STEPS)
+    scenarios_path = os.path.join(run_dir, "scenarios.jsonl")
+    with open(scenarios_path, "w", encoding="utf-8") as f:
+        for i in range(min(args.count, 16)):
+            f.write(json.dumps(make_scenario(kb, i, pad="scenario")) + "\n")
+    report_path = os.path.join(run_dir, "load_report.json")
+    if os.path.exists(report_path):
+        os.remove(report_path)
+
+    env = dict(os.environ, OPENAI_API_KEY="stub", OPENAI_BASE_URL=f"http://127.0.0.1:{args.stub_port}/v1")
+    procs: list[subprocess.Popen] = []
+    server: Optional[subprocess.Popen] = None
+    logs = []
+
+    def spawn(name: str, cmd: list[str]) -> subprocess.Popen:
+        log = open(os.path.join(run_dir, f"{name}.out"), "w")
+        logs.append(log)
+        return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+
+    result: dict[str, Any] = {"server": label, "agents": agents, "message_kb": kb, "count": args.count}
+    try:
+        server = spawn("server", [sys.executable, os.path.join(ROOT, "server.py"), "--config", server_cfg_path])
+        wait_for_port(args.host, args.port, args.startup_timeout, server)
+        sampler = ProcessSampler(server.pid)
+
+        for i in range(agents):
+            procs.append(spawn(f"runner{i}", [
+                sys.executable, TEMPLATE_AGENT, "--steps", steps_path, "--config", client_cfg_path,
+                "--host", args.host, "--port", str(args.port), "--ignore-replies",
+            ]))
+
+        # The InputAgent probes until every runner answers, so runner startup
+        # (imports, tokenizer, connecting) stays out of the measured window.
+        load_cmd = [
+            sys.executable, INPUT_AGENT, "--script", scenarios_path, "--count", str(args.count),
+            "--timeout", str(args.timeout), "--report", report_path, "--config", client_cfg_path,
+            "--host", args.host, "--port", str(args.port), "--replies-per-request", str(agents),
+            "--probe-timeout", str(args.probe_timeout),
+        ]
+        if args.rate:
+            load_cmd += ["--rate", str(args.rate)]
+        if args.concurrency:
+            load_cmd += ["--concurrency", str(args.concurrency)]
+        procs.append(spawn("input_agent", load_cmd))
+
+        # (time, server CPU seconds) samples; the measured window is cut from them
+        # once the report says how long the timed run took.
+        cpu_samples: list[tuple[float, Optional[float]]] = []
+        deadline = time.monotonic() + args.probe_timeout + args.timeout + args.count / max(args.rate or 1.0, 1.0) + 60
+        while not os.path.exists(report_path) and time.monotonic() < deadline:
+            sampler.sample()
+            cpu_samples.append((time.monotonic(), sampler.cpu_seconds()))
+            time.sleep(args.sample_interval)
+        t1, cpu1 = time.monotonic(), sampler.cpu_seconds()
+        sampler.sample()
+
+        if os.path.exists(report_path):
+            time.sleep(0.2)  # report is written in one go; let the file close
+            with open(report_path, "r", encoding="utf-8") as f:
+                result["load"] = json.load(f)
+        else:
+            result["error"] = "no load report before the deadline"
+        t0, cpu0 = sample_before(cpu_samples, t1 - result["load"]["elapsed_s"]) if "load" in result else (t1, cpu1)
+        elapsed = max(t1 - t0, 1e-9)
+        result["server_process"] = {
+            "cpu_seconds": None if cpu0 is None or cpu1 is None else round(cpu1 - cpu0, 3),
+            "cpu_percent": None if cpu0 is None or cpu1 is None else round((cpu1 - cpu0) / elapsed * 100, 1),
+            "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+        }
+        result["invalid"] = invalid_reasons(result.get("load"))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        for proc in reversed(procs):
+            stop(proc)
+        stop(server)
+        for log in logs:
+            log.close()
+    return result
+
+
+def invalid_reasons(load: Optional[dict]) -> list[str]:
+    """Why a run does not measure what the other runs measure (empty when valid)."""
+    if load is None:
+        return []  # reported as an error instead
+    reasons = []
+    if load.get("cancelled_replies"):
+        reasons.append(f"{load['cancelled_replies']} cancelled replies (runner guardrail, no model call)")
+    probe = load.get("probe")
+    if probe is not None and not probe.get("ready"):
+        reasons.append("probe unanswered: not every runner was ready")
+    return reasons
+
+
+def summary_line(r: dict) -> str:
+    head = f"{r['server']:<28} agents {r['agents']:>3}  {r['message_kb']:>5} KB"
+    if "load" not in r:
+        return f"{head}  \033[31m{r.get('error')}\033[0m"
+    load, proc = r["load"], r["server_process"]
+    fanout, last = load["fanout"], load["latency_last_reply_ms"]
+    line = (
+        f"{head}  {load['throughput_msgs_s']} msg/s  p50 {load['latency_ms']['p50']} ms  "
+        f"p99 {load['latency_ms']['p99']} ms  last-reply p99 {last['p99']} ms  "
+        f"replies/req {fanout['per_request_min']}-{fanout['per_request_max']}  "
+        f"timeouts {load['timeouts']}  warnings {load['server_warnings']}  "
+        f"cpu {proc['cpu_percent']}%  rss {proc['peak_rss_mb']} MB"
+    )
+    if r.get("invalid"):
+        line += f"  \033[31mINVALID: {'; '.join(r['invalid'])}\033[0m"
+    return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark server backends/configs under the same agent traffic.")
+    parser.add_argument("--configs", nargs="+", default=["configs/server_config.json", "configs/server_config_python.json"])
+    parser.add_argument("--worker-threads", dest="worker_threads", nargs="+", type=int, default=None, help="worker_threads values (configs that define it).")
+    parser.add_argument("--agents", nargs="+", type=int, default=[1, 4], help="Number of template runners (= reply fan-out).")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1, 16], help="Approximate message sizes in KB.")
+    parser.add_argument("--count", type=int, default=200, help="Messages per run.")
+    parser.add_argument("--rate", type=float, default=None, help="Open-loop send rate (msg/s). Default: closed loop.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max requests in flight (closed loop).")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in the load generator.")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[], help="Server config override, e.g. hyper_parameters.rate_limit_msgs_per_minute=100000 (repeatable).")
+    parser.add_argument("--latency-ms", dest="latency_ms", type=float, default=0.0, help="Stub LLM latency per call.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--stub-port", dest="stub_port", type=int, default=8900)
+    parser.add_argument("--probe-timeout", dest="probe_timeout", type=float, default=60.0, help="Max seconds for every runner to answer a probe before the timed run.")
+    parser.add_argument("--startup-timeout", dest="startup_timeout", type=float, default=30.0)
+    parser.add_argument("--sample-interval", dest="sample_interval", type=float, default=0.25)
+    parser.add_argument("--out", default="bench_results")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    stub_log = open(os.path.join(args.out, "openai_stub.out"), "w")
+    stub = subprocess.Popen(
+        [sys.executable, OPENAI_STUB, "--port", str(args.stub_port), "--latency-ms", str(args.latency_ms)],
+        cwd=ROOT, stdout=stub_log, stderr=subprocess.STDOUT,
+    )
+    results: list[dict] = []
+    try:
+        wait_for_port("127.0.0.1", args.stub_port, args.startup_timeout, stub)
+        for config_path in args.configs:
+            with open(config_path, "r", encoding="utf-8") as f:
+                base = json.load(f)
+            for key, value in args.overrides:
+                set_key(base, key, value)
+            version = base.get("version", "python")
+            has_workers = isinstance(base.get("hyper_parameters"), dict) and "worker_threads" in base["hyper_parameters"]
+            for workers in (args.worker_threads or [None]) if has_workers else [None]:
+                cfg = json.loads(json.dumps(base))
+                if workers is not None:
+                    cfg["hyper_parameters"]["worker_threads"] = workers
+                label = f"{version}" + (f"-w{workers}" if workers is not None else "")
+                for agents in args.agents:
+                    for kb in args.sizes:
+                        r = run_once(args, cfg, label, agents, kb)
+                        r.update({"config": config_path, "version": version, "worker_threads": workers})
+                        results.append(r)
+                        print(summary_line(r), flush=True)
+    finally:
+        stop(stub)
+        stub_log.close()
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+            "settings": {
+                k: v for k, v in vars(args).items() if k not in ("overrides",)
+            } | {"overrides": [f"{k}={json.dumps(v)}" for k, v in args.overrides]},
+            "runs": results,
+        }
+        print(f"report: {write_json(os.path.join(args.out, 'report.json'), report)}")